@@ -0,0 +1,321 @@
+import contextlib, cv2 as cv, io, json, numpy as np, os, sys, time
+
+PALAVRAS = ('arquivo', 'processo', 'documento', 'pagina', 'texto', 'imagem', 'folha', 'contrato', 'registro', 'valor',
+		'data', 'nome', 'parte', 'sobre', 'entre', 'quando', 'depois', 'antes', 'todos', 'cada', 'para', 'como',
+		'pelo', 'mesmo', 'outro', 'ainda', 'tempo', 'forma', 'caso', 'ponto', 'linha', 'campo', 'total', 'saldo',
+		'conta', 'banco', 'cidade', 'estado', 'numero', 'codigo', 'artigo', 'lei', 'prazo', 'termo', 'acordo')
+
+ETAPAS = ('leitura', 'calcular_vertices', 'image_align', 'convert_bw', 'convert_bw.threshold', 'convert_bw.contornos', \
+		'convert_bw.ruidos', 'ocr', 'corrige_texto')
+
+
+def avaliar_pagina(ocr_workflow, foto, vertices_reais, texto_real, parametros, ocr, substituicoes):
+	'''
+	Executa as etapas do workflow sobre uma página sintética, medindo cada uma (ver medir em ocr_workflow.nucleo)
+
+	Args:
+		ocr_workflow: Módulo ocr_workflow.nucleo
+		foto: Bytes do JPEG da página fotografada
+		vertices_reais: Vértices onde a folha foi posicionada na foto
+		texto_real: Texto impresso na folha
+		parametros: Dict com os parâmetros de tratamento (mesmos nomes das configurações)
+		ocr: Função de OCR criada por criar_ocr, ou None para pular o OCR
+		substituicoes: Regras de correção do texto
+
+	Returns:
+		Dict: Métricas da página, com o erro dos vértices em pixels e a taxa de erro de caracteres (CER)
+	'''
+	metricas = {}
+	medir = ocr_workflow.medir
+
+	# As mensagens das funções do workflow são descartadas para não poluir o resultado
+	with contextlib.redirect_stdout(io.StringIO()):
+		with medir(metricas, 'leitura'):
+			image_gs = cv.cvtColor(cv.imdecode(np.frombuffer(foto, np.uint8), cv.IMREAD_COLOR), cv.COLOR_BGR2GRAY)
+
+		with medir(metricas, 'calcular_vertices'):
+			vertices, _, qualidade = ocr_workflow.calcular_vertices(image_gs, parametros['LIMIAR_BINARIZACAO_DETECCAO_BORDAS'], \
+					reducao=parametros['VERTICES_REDUCAO'], refinar=parametros['VERTICES_REFINAR'])
+
+		escala = parametros['ALINHAMENTO_ESCALA']
+		if parametros['ALINHAMENTO_DPI']:
+			largura_folha = max(p[0] for p in vertices) - min(p[0] for p in vertices)
+			escala = parametros['ALINHAMENTO_DPI'] * parametros['PAGINA_LARGURA_MM'] / 25.4 / largura_folha
+
+		with medir(metricas, 'image_align'):
+			image_crop = ocr_workflow.image_align(image_gs, vertices, tuple(parametros['REMOVER_BORDAS']), escala, \
+					ocr_workflow.INTERPOLACOES[parametros['ALINHAMENTO_INTERPOLACAO']])
+		del image_gs
+
+		with medir(metricas, 'convert_bw'):
+			image_bw, _ = ocr_workflow.convert_bw(image_crop, parametros['BINARIZACAO_BLUR'], parametros['BINARIZACAO_BLOCKSIZE'], \
+					parametros['BINARIZACAO_LIMIAR'], parametros['NOISE_VERYSMALL'], parametros['NOISE_SMALL'], \
+					parametros['NOISE_ISOLATION_MIN'], parametros['CHAR_RADIUS_MIN'], metricas)
+		del image_crop
+
+		if ocr:
+			texto = ocr(image_bw, metricas)
+			with medir(metricas, 'corrige_texto'):
+				texto = ocr_workflow.corrige_texto(texto, substituicoes)
+			metricas['cer'] = taxa_erro_caracteres(texto, texto_real)
+
+	metricas['erro_vertices'] = float(np.abs(np.array(vertices, np.float64) - np.array(vertices_reais)).max())
+	metricas['qualidade_vertices'] = min(qualidade)
+	return metricas
+
+
+def comparar_referencia(resumo, referencia, tolerancia, tempo_minimo=0.01, cer_tolerancia=0.02):
+	'''
+	Compara o resumo atual com o de uma execução anterior, apontando as etapas que ficaram mais lentas
+	ou as resoluções em que o OCR piorou
+
+	Args:
+		resumo: Resumo da execução atual (ver resumir)
+		referencia: Resumo da execução de referência
+		tolerancia: Aumento relativo aceito na mediana do tempo. Ex: 0.2 (20%)
+		tempo_minimo: Etapas mais rápidas que isso na referência são ignoradas, pois a medição oscila demais
+		cer_tolerancia: Aumento absoluto aceito no CER médio
+
+	Returns:
+		Array: Mensagens descrevendo cada regressão encontrada
+	'''
+	regressoes = []
+	for resolucao, atual in resumo.items():
+		anterior = referencia.get(resolucao)
+		if not anterior: continue
+		for etapa, tempos in atual['etapas'].items():
+			tempo_anterior = anterior['etapas'].get(etapa, {}).get('tempo_p50', 0)
+			if tempo_anterior >= tempo_minimo and tempos['tempo_p50'] > tempo_anterior * (1 + tolerancia):
+				regressoes.append(f"{resolucao}: {etapa} {tempo_anterior:.3f}s -> {tempos['tempo_p50']:.3f}s")
+		if atual.get('cer') is not None and anterior.get('cer') is not None \
+				and atual['cer'] > anterior['cer'] + cer_tolerancia:
+			regressoes.append(f"{resolucao}: CER {anterior['cer']:.3f} -> {atual['cer']:.3f}")
+	return regressoes
+
+
+def gerar_pagina(megapixels, rng, linhas=30, palavras_por_linha=7):
+	'''
+	Gera a foto sintética de uma folha A4 impressa sobre um fundo escuro, com perspectiva aleatória,
+	manchas, variação de iluminação e ruído do sensor
+
+	Args:
+		megapixels: Resolução da foto (proporção 4:3). Ex: 12, 48
+		rng: numpy.random.Generator, para que as páginas sejam reproduzíveis
+		linhas: Qtd de linhas de texto impressas
+		palavras_por_linha: Qtd de palavras de cada linha
+
+	Returns:
+		Bytes: Foto codificada em JPEG
+		Array: Vértices da folha na foto. Canto Sup Esq. Sentido Horário
+		String: Texto impresso na folha
+	'''
+	largura = int(round((megapixels * 1e6 * 4 / 3) ** 0.5))
+	altura = int(round(largura * 3 / 4))
+
+	# Folha A4 em pé, ocupando cerca de 85% da altura da foto
+	folha_altura = int(altura * 0.85)
+	folha_largura = int(folha_altura / 2 ** 0.5)
+	folha = np.full((folha_altura, folha_largura), 235, np.uint8)
+
+	# Imprime o texto com a fonte ajustada para a maior linha caber na folha
+	texto = [' '.join(rng.choice(PALAVRAS, palavras_por_linha)) for _ in range(linhas)]
+	margem = int(folha_largura * 0.08)
+	fonte = cv.FONT_HERSHEY_SIMPLEX
+	largura_maior = max(cv.getTextSize(linha, fonte, 1, 2)[0][0] for linha in texto)
+	tamanho = (folha_largura - 2 * margem) / largura_maior
+	espessura = max(1, int(round(tamanho * 2)))
+	passo = (folha_altura - 2 * margem) / linhas
+	for i, linha in enumerate(texto):
+		cv.putText(folha, linha, (margem, int(margem + passo * (i + 0.7))), fonte, tamanho, 20, espessura, cv.LINE_AA)
+
+	# Manchas e sujeiras pequenas, que a remoção de ruídos deve eliminar
+	raio_mancha = max(1, folha_largura // 1500)
+	for x, y in zip(rng.integers(0, folha_largura, 400).tolist(), rng.integers(0, folha_altura, 400).tolist()):
+		cv.circle(folha, (x, y), int(rng.integers(1, 3 * raio_mancha + 1)), 40, -1)
+
+	# Posiciona a folha sobre o fundo escuro com uma perspectiva aleatória. Cada vértice fica em seu quadrante
+	x0, y0 = (largura - folha_largura) / 2, (altura - folha_altura) / 2
+	desvio = np.array([folha_largura, folha_altura]) * 0.05
+	vertices = np.array([[x0, y0], [x0 + folha_largura, y0], [x0 + folha_largura, y0 + folha_altura], [x0, y0 + folha_altura]])
+	vertices = np.clip(vertices + rng.uniform(-1, 1, (4, 2)) * desvio, 0, [largura - 1, altura - 1]).astype(np.float32)
+	origem = np.array([[0, 0], [folha_largura - 1, 0], [folha_largura - 1, folha_altura - 1], [0, folha_altura - 1]], np.float32)
+	foto = np.full((altura, largura), 45, np.uint8)
+	cv.warpPerspective(folha, cv.getPerspectiveTransform(origem, vertices), (largura, altura), foto, \
+			cv.INTER_LINEAR, cv.BORDER_TRANSPARENT)
+	del folha
+
+	# Iluminação irregular (mais escura em um dos lados) e ruído do sensor
+	gradiente = np.linspace(1.0, rng.uniform(0.75, 0.95), largura, dtype=np.float32)
+	np.multiply(foto, gradiente, out=foto, casting='unsafe')
+	ruido = np.empty((altura, largura), np.int16)
+	cv.randn(ruido, 0, 6)
+	foto = cv.add(foto, ruido, dtype=cv.CV_8U)
+	del ruido
+
+	jpeg = cv.imencode('.jpg', cv.cvtColor(foto, cv.COLOR_GRAY2BGR), [cv.IMWRITE_JPEG_QUALITY, 92])[1].tobytes()
+	return jpeg, vertices.tolist(), '\n'.join(texto)
+
+
+def resumir(paginas_por_resolucao):
+	'''
+	Resume as métricas das páginas de cada resolução
+
+	Args:
+		paginas_por_resolucao: Dict {resolução: lista com as métricas de cada página (ver avaliar_pagina)}
+
+	Returns:
+		Dict: Para cada resolução, vazão (páginas por minuto e megapixels por segundo), latência de cada etapa
+			(mediana, p90 e máximo), pico de memória, CER médio e o maior erro dos vértices
+	'''
+	resumo = {}
+	for megapixels, paginas in paginas_por_resolucao.items():
+		etapas = {}
+		for etapa in ETAPAS:
+			registros = [pagina['etapas'][etapa] for pagina in paginas if etapa in pagina.get('etapas', {})]
+			if not registros: continue
+			tempos = np.array([registro['tempo'] for registro in registros])
+			etapas[etapa] = {
+				'tempo_p50': float(np.percentile(tempos, 50)), 'tempo_p90': float(np.percentile(tempos, 90)),
+				'tempo_max': float(tempos.max()), 'memoria_mb_max': max(registro['memoria_mb'] for registro in registros),
+			}
+		# Tempo total de cada página, somente das etapas principais (as subetapas já estão contidas em convert_bw)
+		tempo_pagina = np.mean([sum(registro['tempo'] for etapa, registro in pagina['etapas'].items() if '.' not in etapa) \
+				for pagina in paginas])
+		cers = [pagina['cer'] for pagina in paginas if 'cer' in pagina]
+		resumo[f'{megapixels}MP'] = {
+			'paginas': len(paginas),
+			'paginas_por_minuto': 60 / tempo_pagina,
+			'megapixels_por_segundo': megapixels / tempo_pagina,
+			'etapas': etapas,
+			'cer': float(np.mean(cers)) if cers else None,
+			'erro_vertices_max': max(pagina['erro_vertices'] for pagina in paginas),
+		}
+	return resumo
+
+
+def taxa_erro_caracteres(texto, referencia):
+	'''
+	Calcula a taxa de erro de caracteres (CER): distância de edição entre o texto extraído e o texto real,
+	dividida pelo tamanho do texto real. Espaços e linhas em branco repetidos são ignorados
+
+	Args:
+		texto: Texto extraído pelo OCR
+		referencia: Texto impresso na página
+
+	Returns:
+		Float: 0 para um texto idêntico. Pode passar de 1 quando o OCR produz muito texto a mais
+	'''
+	normalizar = lambda t: '\n'.join(' '.join(linha.split()) for linha in t.splitlines() if linha.strip())
+	a = np.frombuffer(normalizar(texto).encode('utf-32-le'), np.uint32)
+	b = np.frombuffer(normalizar(referencia).encode('utf-32-le'), np.uint32)
+	if not len(b): return float(len(a) > 0)
+
+	# Levenshtein linha a linha da matriz. A inserção (dependência da coluna anterior) vira um mínimo acumulado
+	colunas = np.arange(len(b) + 1)
+	anterior = colunas.copy()
+	for i, caractere in enumerate(a, 1):
+		atual = np.empty_like(anterior)
+		atual[0] = i
+		atual[1:] = np.minimum(anterior[1:] + 1, anterior[:-1] + (b != caractere))
+		atual = np.minimum.accumulate(atual - colunas) + colunas
+		anterior = atual
+	return float(anterior[-1]) / len(b)
+
+
+if __name__ == "__main__":
+
+	# INICIO DAS CONFIGURAÇÕES
+	####################################################################################################################
+
+	RESOLUCOES_MP = [2, 12, 48]                 # Resoluções das fotos sintéticas, em megapixels
+	PAGINAS_POR_RESOLUCAO = 3                   # Qtd de páginas geradas em cada resolução
+	SEMENTE = 0                                 # Mesma semente, mesmas páginas. Mantenha fixa para comparar execuções
+	EXECUTAR_OCR = 1                            # 0: mede somente o tratamento das imagens (dispensa o Tesseract)
+	OCR_BACKEND = 'auto'                        # Ver OCR_BACKEND em ocr-workflow.py
+	TESSERACT_CONFIG = '--psm 6 -l eng'
+	GRAVAR_PAGINAS = 0                          # 1: Grava as fotos sintéticas na pasta de saída, para conferência
+	TOLERANCIA_REGRESSAO = 0.2                  # Aumento aceito no tempo mediano de cada etapa em relação à referência
+
+	# Mesmos parâmetros padrão de ocr-workflow.py. ALINHAMENTO_DPI uniformiza a imagem alinhada entre as resoluções
+	PARAMETROS = {
+		'LIMIAR_BINARIZACAO_DETECCAO_BORDAS': 120,
+		'VERTICES_REDUCAO': 1,
+		'VERTICES_REFINAR': 1,
+		'REMOVER_BORDAS': [10, 10, 10, 10],
+		'ALINHAMENTO_INTERPOLACAO': 'linear',
+		'ALINHAMENTO_ESCALA': 1.0,
+		'ALINHAMENTO_DPI': 300,
+		'PAGINA_LARGURA_MM': 210,
+		'BINARIZACAO_BLUR': 3,
+		'BINARIZACAO_BLOCKSIZE': 101,
+		'BINARIZACAO_LIMIAR': 15,
+		'NOISE_VERYSMALL': 2,
+		'NOISE_SMALL': 5,
+		'NOISE_ISOLATION_MIN': 40,
+		'CHAR_RADIUS_MIN': 4,
+	}
+
+	####################################################################################################################
+	# FIM DAS CONFIGURAÇÕES
+
+	current_path = os.path.dirname(os.path.realpath(__file__))
+	PASTA_SAIDA = current_path + '/benchmark'
+	os.makedirs(PASTA_SAIDA, exist_ok=True)
+	arquivo_resultado = PASTA_SAIDA + '/BENCHMARK_RESULTADO.json'
+	arquivo_referencia = PASTA_SAIDA + '/BENCHMARK_REFERENCIA.json'
+
+	from ocr_workflow import nucleo as ocr_workflow
+	substituicoes = {r'[‘’]': '\'', r'[“”]': '"', r'\u000c': ''}
+
+	ocr = None
+	if EXECUTAR_OCR:
+		ocr, backend = ocr_workflow.criar_ocr(OCR_BACKEND, TESSERACT_CONFIG)
+		print(f'OCR: backend {backend}')
+
+	rng = np.random.default_rng(SEMENTE)
+	paginas_por_resolucao = {}
+	for megapixels in RESOLUCOES_MP:
+		paginas_por_resolucao[megapixels] = []
+		for i in range(PAGINAS_POR_RESOLUCAO):
+			foto, vertices_reais, texto_real = gerar_pagina(megapixels, rng)
+			if GRAVAR_PAGINAS:
+				with open(f'{PASTA_SAIDA}/pagina_{megapixels}MP_{i}.jpg', 'wb') as file:
+					file.write(foto)
+			try:
+				metricas = avaliar_pagina(ocr_workflow, foto, vertices_reais, texto_real, PARAMETROS, ocr, substituicoes)
+			except Exception as erro:
+				# Sem o Tesseract instalado, o benchmark continua medindo somente o tratamento
+				if not ocr: raise
+				print(f'OCR indisponível ({type(erro).__name__}: {erro}). Continuando sem OCR')
+				ocr = None
+				metricas = avaliar_pagina(ocr_workflow, foto, vertices_reais, texto_real, PARAMETROS, ocr, substituicoes)
+			paginas_por_resolucao[megapixels].append(metricas)
+			tempos = ' '.join(f"{etapa}={metricas['etapas'][etapa]['tempo']:.3f}s" for etapa in ETAPAS \
+					if '.' not in etapa and etapa in metricas['etapas'])
+			cer = f" CER={metricas['cer']:.3f}" if 'cer' in metricas else ''
+			print(f"{megapixels}MP pagina {i}: {tempos}{cer} erro_vertices={metricas['erro_vertices']:.1f}px")
+
+	resumo = resumir(paginas_por_resolucao)
+	with open(arquivo_resultado, 'w') as file:
+		json.dump({'data': time.strftime('%Y-%m-%d %H:%M:%S'), 'parametros': PARAMETROS, 'resumo': resumo, \
+				'paginas': {f'{mp}MP': paginas for mp, paginas in paginas_por_resolucao.items()}}, file, indent=1)
+
+	for resolucao, dados in resumo.items():
+		cer = f", CER {dados['cer']:.3f}" if dados['cer'] is not None else ''
+		print(f"{resolucao}: {dados['paginas_por_minuto']:.1f} páginas/min, {dados['megapixels_por_segundo']:.1f} MP/s, " \
+				f"memória {max(e['memoria_mb_max'] for e in dados['etapas'].values()):.0f}MB{cer}, " \
+				f"erro vértices {dados['erro_vertices_max']:.1f}px")
+	print(f'Resultado gravado em: {arquivo_resultado}')
+
+	# A primeira execução vira a referência. As seguintes são comparadas com ela
+	if not os.path.exists(arquivo_referencia):
+		with open(arquivo_referencia, 'w') as file:
+			json.dump(resumo, file, indent=1)
+		print(f'Referência gravada em: {arquivo_referencia}')
+	else:
+		with open(arquivo_referencia) as file:
+			regressoes = comparar_referencia(resumo, json.load(file), TOLERANCIA_REGRESSAO)
+		for regressao in regressoes:
+			print(f'REGRESSÃO: {regressao}')
+		if regressoes: sys.exit(1)
+		print('Nenhuma regressão em relação à referência')
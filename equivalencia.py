@@ -0,0 +1,225 @@
+import contextlib, cv2 as cv, io, numpy as np, sys
+
+
+def apagar_ruidos_referencia(image_bw, contornos, noise):
+	'''
+	Implementação original da remoção dos ruídos: um cv.circle por ruído
+
+	Args:
+		image_bw: Imagem binária, alterada no próprio lugar
+		contornos: Array estruturada com as características dos contornos (ver extrair_contornos)
+		noise: Array booleana indicando os contornos considerados ruído
+	'''
+	for contorno in contornos[noise]:
+		cv.circle(image_bw, (int(contorno['cx']), int(contorno['cy'])), int(contorno['raio']) + 2, 255, -1)
+
+
+def classificar_referencia(centers, radius, hierarchy, noise_verysmall, noise_small, noise_dist_min, char_radius_min, \
+		char_radius_max):
+	'''
+	Implementação original da classificação (is_noise): cada contorno pequeno é comparado com todos os demais
+
+	Args:
+		centers: Lista com o centro (x, y) de cada contorno
+		radius: Lista com o raio de cada contorno
+		hierarchy: Hierarquia no formato de cv.findContours (RETR_TREE)
+		noise_verysmall, noise_small, noise_dist_min, char_radius_min, char_radius_max: Ver classificar_contornos
+
+	Returns:
+		List: (ruído, motivo, id do contorno associado) de cada contorno, no formato de classificar_contornos
+	'''
+	resultado = []
+	for i in range(len(centers)):
+		parent_contour = hierarchy[0][i][3]
+		if parent_contour > 0 and radius[parent_contour] < char_radius_max:
+			resultado.append((False, 'hole', parent_contour))
+		elif radius[i] <= noise_verysmall:
+			resultado.append((True, 'verysmall', -1))
+		elif radius[i] <= noise_small:
+			proximo = next((ii for ii, c in enumerate(centers) if i != ii and abs(c[0] - centers[i][0]) <= noise_dist_min \
+					and abs(c[1] - centers[i][1]) <= noise_dist_min and radius[ii] >= char_radius_min), None)
+			resultado.append((False, 'close', proximo) if proximo is not None else (True, 'far', -1))
+		else:
+			resultado.append((False, 'default', -1))
+	return resultado
+
+
+def gerar_contornos(ocr_workflow, rng, qtd, largura, altura):
+	'''
+	Gera contornos sintéticos, com centros agrupados (como as letras de uma linha) e espalhados
+
+	Args:
+		ocr_workflow: Módulo ocr_workflow.nucleo
+		rng: numpy.random.Generator
+		qtd: Qtd de contornos
+		largura, altura: Região onde ficam os centros. Alguns ficam fora dela, como os ruídos na borda da foto
+
+	Returns:
+		NumPy Array: Array estruturada no formato CONTORNO_DTYPE
+	'''
+	contornos = np.zeros(qtd, dtype=ocr_workflow.CONTORNO_DTYPE)
+	grupos = rng.integers(0, (largura, altura), (max(1, qtd // 8), 2))
+	agrupados = grupos[rng.integers(0, len(grupos), qtd)] + rng.integers(-12, 13, (qtd, 2))
+	espalhados = rng.integers(-10, (largura + 10, altura + 10), (qtd, 2))
+	centros = np.where(rng.random((qtd, 1)) < 0.7, agrupados, espalhados)
+	contornos['cx'], contornos['cy'] = centros.T
+	contornos['raio'] = rng.integers(0, 15, qtd)
+	contornos['pai'] = np.where(rng.random(qtd) < 0.3, rng.integers(0, qtd, qtd), -1)
+	return contornos
+
+
+def gerar_imagem(rng, tamanho_min=20, tamanho_max=300):
+	'''
+	Gera uma imagem em tons de cinza com manchas suaves e, às vezes, ruído, que na binarização
+	produz contornos de todos os tamanhos, buracos dentro de buracos e contornos que cruzam a imagem
+
+	Args:
+		rng: numpy.random.Generator
+		tamanho_min, tamanho_max: Limites da altura e da largura
+
+	Returns:
+		NumPy Array: Imagem em tons de cinza
+	'''
+	altura, largura = rng.integers(tamanho_min, tamanho_max, 2)
+	base = rng.integers(0, 256, (altura // 4 + 1, largura // 4 + 1)).astype(np.uint8)
+	image_gs = cv.resize(base, (int(largura), int(altura)), interpolation=cv.INTER_CUBIC)
+	if rng.random() < 0.5:
+		image_gs = cv.add(image_gs, rng.integers(0, 60, (altura, largura)).astype(np.uint8))
+	return image_gs
+
+
+def verificar_apagar_ruidos(ocr_workflow, rng, casos):
+	'''
+	Compara apagar_ruidos com um cv.circle por ruído, em imagens contíguas e em recortes não contíguos,
+	com ruídos inteiros dentro da imagem, na borda e fora dela
+
+	Args:
+		ocr_workflow: Módulo ocr_workflow.nucleo
+		rng: numpy.random.Generator
+		casos: Qtd de imagens testadas
+
+	Returns:
+		Int: Qtd de casos com resultado diferente
+	'''
+	falhas = 0
+	for caso in range(casos):
+		altura, largura = rng.integers(1, 200, 2)
+		imagem = rng.integers(0, 2, (altura, largura + 7)).astype(np.uint8) * 255
+		contornos = gerar_contornos(ocr_workflow, rng, int(rng.integers(0, 300)), largura, altura)
+		noise = rng.random(len(contornos)) < 0.6
+		# Nos casos ímpares, um recorte da imagem maior (não contíguo)
+		image_bw = imagem[:, 3:3 + largura] if caso % 2 else imagem[:, :largura].copy()
+		esperado = image_bw.copy()
+		apagar_ruidos_referencia(esperado, contornos, noise)
+		ocr_workflow.apagar_ruidos(image_bw, contornos, noise)
+		if not np.array_equal(image_bw, esperado):
+			falhas += 1
+			print(f'apagar_ruidos: caso {caso} ({altura} x {largura}, {int(noise.sum())} ruídos) difere')
+	return falhas
+
+
+def verificar_classificacao(ocr_workflow, rng, casos):
+	'''
+	Compara classificar_contornos (índice em grade, em lotes) com a varredura de todos os pares do is_noise original.
+	Nos casos pares os contornos vêm de uma imagem binarizada (passando também por extrair_contornos),
+	nos ímpares são sintéticos, mais densos e com centros fora da imagem
+
+	Args:
+		ocr_workflow: Módulo ocr_workflow.nucleo
+		rng: numpy.random.Generator
+		casos: Qtd de casos testados
+
+	Returns:
+		Int: Qtd de casos com resultado diferente
+	'''
+	falhas = 0
+	for caso in range(casos):
+		noise_dist_min = int(rng.integers(0, 30)); noise_small = int(rng.integers(0, 8))
+		noise_verysmall = int(rng.integers(0, 3)); char_radius_min = int(rng.integers(0, 6))
+		if caso % 2:
+			contornos = gerar_contornos(ocr_workflow, rng, int(rng.integers(0, 800)), 400, 300)
+			hierarchy = np.zeros((1, len(contornos), 4), np.int32); hierarchy[0][:, 3] = contornos['pai']
+		else:
+			image_bw = cv.adaptiveThreshold(gerar_imagem(rng), 255, cv.ADAPTIVE_THRESH_MEAN_C, cv.THRESH_BINARY, 11, 2)
+			contours, hierarchy = cv.findContours(image_bw, cv.RETR_TREE, cv.CHAIN_APPROX_SIMPLE)
+			contornos = ocr_workflow.extrair_contornos(contours, hierarchy)
+			# Círculo de cada contorno calculado como no código original, para conferir também extrair_contornos
+			circulos = [cv.minEnclosingCircle(cv.approxPolyDP(contorno, 3, True)) for contorno in contours]
+			if [(round(c[0][0]), round(c[0][1]), round(c[1])) for c in circulos] != \
+					list(zip(contornos['cx'].tolist(), contornos['cy'].tolist(), contornos['raio'].tolist())):
+				falhas += 1
+				print(f'extrair_contornos: caso {caso} difere')
+				continue
+		esperado = classificar_referencia(list(zip(contornos['cx'].tolist(), contornos['cy'].tolist())), \
+				contornos['raio'].tolist(), hierarchy, noise_verysmall, noise_small, noise_dist_min, char_radius_min, \
+				noise_dist_min * 2)
+		# Lotes pequenos para que a consulta em lotes também seja exercitada
+		noise, motivo, associado = ocr_workflow.classificar_contornos(contornos, noise_verysmall, noise_small, \
+				noise_dist_min, char_radius_min, noise_dist_min * 2, lote=int(rng.integers(1, 64)))
+		obtido = [(bool(n), ocr_workflow.MOTIVOS[m], int(a)) for n, m, a in zip(noise, motivo, associado)]
+		if obtido != esperado:
+			falhas += 1
+			print(f'classificar_contornos: caso {caso} ({len(contornos)} contornos) difere')
+	return falhas
+
+
+def verificar_faixas(ocr_workflow, rng, casos):
+	'''
+	Compara convert_bw em faixas (altura_faixa > 0) com convert_bw na imagem inteira:
+	a imagem binarizada e as marcações de cada contorno (posição, círculo, classificação) precisam ser iguais
+
+	Args:
+		ocr_workflow: Módulo ocr_workflow.nucleo
+		rng: numpy.random.Generator
+		casos: Qtd de imagens testadas
+
+	Returns:
+		Int: Qtd de casos com resultado diferente
+	'''
+	def caracteristicas(marcacoes):
+		# A ordem dos contornos pode mudar entre as faixas, então as marcações são comparadas ordenadas
+		return sorted(zip(*(marcacoes[campo].tolist() for campo in ('x', 'y', 'w', 'h', 'cx', 'cy', 'raio', 'ruido', 'motivo'))))
+
+	falhas = 0
+	for caso in range(casos):
+		image_gs = gerar_imagem(rng)
+		blursize = int(rng.choice([1, 3, 5])); blocksize = int(rng.choice([3, 5, 11, 21])); limiar = int(rng.integers(-5, 15))
+		noise_dist_min = int(rng.integers(1, 6)); noise_small = int(rng.integers(1, 4))
+		noise_verysmall = int(rng.integers(0, 2)); char_radius_min = int(rng.integers(1, 4))
+		altura_faixa = int(rng.integers(1, 60))
+		argumentos = (image_gs, blursize, blocksize, limiar, noise_verysmall, noise_small, noise_dist_min, char_radius_min)
+		with contextlib.redirect_stdout(io.StringIO()):
+			inteira_bw, inteira_marcacoes = ocr_workflow.convert_bw(*argumentos)
+			faixas_bw, faixas_marcacoes = ocr_workflow.convert_bw(*argumentos, None, altura_faixa)
+		if not np.array_equal(inteira_bw, faixas_bw) or caracteristicas(inteira_marcacoes) != caracteristicas(faixas_marcacoes):
+			falhas += 1
+			print(f'convert_bw: caso {caso} ({image_gs.shape[0]} x {image_gs.shape[1]}, faixa {altura_faixa}) difere')
+	return falhas
+
+
+if __name__ == "__main__":
+
+	# INICIO DAS CONFIGURAÇÕES
+	####################################################################################################################
+
+	SEMENTE = 0                                 # Mesma semente, mesmos casos. Troque para testar outros casos
+	CASOS = 300                                 # Qtd de casos testados em cada verificação
+
+	####################################################################################################################
+	# FIM DAS CONFIGURAÇÕES
+
+	from ocr_workflow import nucleo as ocr_workflow
+
+	# Cada otimização é comparada com a implementação que ela substituiu, em casos aleatórios
+	verificacoes = {
+		'classificar_contornos (índice em grade)': verificar_classificacao,
+		'apagar_ruidos (círculos por raio)': verificar_apagar_ruidos,
+		'convert_bw (binarização em faixas)': verificar_faixas,
+	}
+	total_falhas = 0
+	for nome, verificar in verificacoes.items():
+		falhas = verificar(ocr_workflow, np.random.default_rng(SEMENTE), CASOS)
+		print(f'{nome}: {CASOS - falhas}/{CASOS} casos iguais')
+		total_falhas += falhas
+	if total_falhas: sys.exit(1)
+	print('Todas as implementações são equivalentes às de referência')
@@ -0,0 +1,226 @@
+'''
+Uso do ocr-workflow como biblioteca, sem janelas, sem xrandr e sem as configurações globais do script
+
+	import ocr_workflow
+
+	config = ocr_workflow.Configuracao(BINARIZACAO_LIMIAR=20, ALINHAMENTO_DPI=300, TESSERACT_CONFIG='-l por')
+	image_bw, texto = ocr_workflow.process_image(foto, config)       # caminho ou NumPy Array
+	for caminho, texto, erro in ocr_workflow.process_folder('fotos', config, processos=4):
+		...
+
+O import é leve: OpenCV, NumPy e o OCR só são carregados na primeira chamada (ver nucleo)
+'''
+import dataclasses, functools, re, threading
+
+__all__ = ['Configuracao', 'SUBSTITUICOES_PADRAO', 'process_folder', 'process_image']
+
+# Parâmetros repassados a tratar_imagem, com os mesmos nomes das configurações do script
+PARAMETROS_TRATAMENTO = ('LIMIAR_BINARIZACAO_DETECCAO_BORDAS', 'VERTICES_REDUCAO', 'VERTICES_REFINAR', 'VERTICES_QUALIDADE_MIN', \
+		'REMOVER_BORDAS', 'ALINHAMENTO_INTERPOLACAO', 'ALINHAMENTO_ESCALA', 'ALINHAMENTO_DPI', 'PAGINA_LARGURA_MM', \
+		'BINARIZACAO_BLUR', 'BINARIZACAO_BLOCKSIZE', 'BINARIZACAO_LIMIAR', 'BINARIZACAO_FAIXA', 'NOISE_VERYSMALL', \
+		'NOISE_SMALL', 'NOISE_ISOLATION_MIN', 'CHAR_RADIUS_MIN')
+
+
+def padronizar_titulo(match):
+	'''
+	Troca por # os caracteres que o OCR confunde com # no início de um título ("#EH" => "###")
+	'''
+	return re.sub(r'[^#]', '#', match.group(1))
+
+
+# Correções padrão do texto extraído, pares (pattern, replacement) aplicados em ordem (ver compilar_correcoes).
+# São as SUBSTITUICOES do script e da Configuracao. A função nomeada, ao contrário de um lambda,
+# permite enviar a Configuracao para outros processos
+SUBSTITUICOES_PADRAO = (
+	(r'[‘’]', '\''),                                       # padroniza aspas simples
+	(r'[“”]', '"'),                                        # padroniza aspas duplas
+	(r'\u000c', ''),                                       # remove caractere de controle
+	(r'(?i)(\b\w+)( \.|\. )(\w{3,4}\b)', r'\1.\3'),        # "arquivo. ext" => "arquivo.ext"
+	(r'(?m)^(#[#EH4]{1,6})\b', padronizar_titulo),         # ^"#EH" => "###"
+)
+
+# Motores de OCR já criados, por configuração, reaproveitados entre as chamadas de process_image
+MOTORES_OCR = {}
+TRAVA_MOTORES = threading.Lock()
+
+
+@dataclasses.dataclass(frozen=True)
+class Configuracao:
+	'''
+	Configurações do tratamento e do OCR. Os nomes e os valores padrão são os mesmos das configurações
+	do script (ver ocr-workflow.py). Por ser imutável, pode ser compartilhada entre threads e processos
+	'''
+	LIMIAR_BINARIZACAO_DETECCAO_BORDAS: int = 120
+	VERTICES_REDUCAO: int = 1
+	VERTICES_REFINAR: int = 1
+	VERTICES_QUALIDADE_MIN: float = 0.3
+	REMOVER_BORDAS: tuple = (10, 10, 10, 10)
+	ALINHAMENTO_INTERPOLACAO: str = 'linear'
+	ALINHAMENTO_ESCALA: float = 1.0
+	ALINHAMENTO_DPI: int = 0
+	PAGINA_LARGURA_MM: float = 210
+	BINARIZACAO_BLUR: int = 3
+	BINARIZACAO_BLOCKSIZE: int = 101
+	BINARIZACAO_LIMIAR: int = 15
+	BINARIZACAO_FAIXA: int = 0          # Linhas de cada faixa da binarização (ver convert_bw). 0: imagem inteira
+	NOISE_VERYSMALL: int = 2
+	NOISE_SMALL: int = 5
+	NOISE_ISOLATION_MIN: int = 40
+	CHAR_RADIUS_MIN: int = 4
+	TESSERACT_CONFIG: str = ''
+	OCR_BACKEND: str = 'auto'
+	OCR_REGIOES: int = 1
+	SUBSTITUICOES: tuple = SUBSTITUICOES_PADRAO  # Pares (pattern, replacement) aplicados em ordem. (): sem correção
+	CACHE_PASTA: str = ''               # Pasta do cache de resultados. Vazio desliga o cache
+	CACHE_TAMANHO_MAX_MB: int = 2048
+	DUPLICATAS_ARQUIVO: str = ''        # Índice das páginas já reconhecidas (ver criar_ocr). Vazio desliga a detecção
+	DUPLICATAS_DISTANCIA: int = 48
+
+	def __post_init__(self):
+		'''
+		Aceita REMOVER_BORDAS como lista e SUBSTITUICOES como dict, as formas usadas no script, guardando-as
+		como tuples para que a configuração continue imutável e possa ser usada como chave (ver criar_corretor)
+		'''
+		substituicoes = self.SUBSTITUICOES.items() if isinstance(self.SUBSTITUICOES, dict) else self.SUBSTITUICOES
+		object.__setattr__(self, 'REMOVER_BORDAS', tuple(self.REMOVER_BORDAS))
+		object.__setattr__(self, 'SUBSTITUICOES', tuple(tuple(par) for par in substituicoes))
+
+	def parametros_tratamento(self):
+		'''
+		Returns:
+			Dict: Parâmetros do tratamento no formato usado por tratar_imagem
+		'''
+		return {nome: getattr(self, nome) for nome in PARAMETROS_TRATAMENTO}
+
+	def cache(self):
+		'''
+		Returns:
+			Dict: {'pasta', 'tamanho_max'} do cache de resultados, ou None quando desligado
+		'''
+		if not self.CACHE_PASTA:
+			return None
+		return {'pasta': self.CACHE_PASTA, 'tamanho_max': self.CACHE_TAMANHO_MAX_MB * 1024 * 1024}
+
+	def duplicatas(self):
+		'''
+		Returns:
+			Dict: {'arquivo', 'distancia'} do índice de duplicatas, ou None quando desligado
+		'''
+		if not self.DUPLICATAS_ARQUIVO:
+			return None
+		return {'arquivo': self.DUPLICATAS_ARQUIVO, 'distancia': self.DUPLICATAS_DISTANCIA}
+
+
+def carregar_nucleo():
+	'''
+	Carrega as funções do script na primeira chamada, junto com OpenCV e NumPy
+
+	Returns:
+		Module: ocr_workflow.nucleo
+	'''
+	from . import nucleo
+	return nucleo
+
+
+@functools.lru_cache(maxsize=16)
+def criar_corretor(config):
+	'''
+	Compila as SUBSTITUICOES uma única vez por configuração
+
+	Args:
+		config: Configuracao
+
+	Returns:
+		Function: Aplica as SUBSTITUICOES ao texto, ou None quando não há substituições
+	'''
+	if not config.SUBSTITUICOES:
+		return None
+	return carregar_nucleo().compilar_correcoes(dict(config.SUBSTITUICOES))
+
+
+def obter_ocr(config):
+	'''
+	Cria o motor de OCR da configuração uma única vez. O motor mantém um Tesseract carregado por thread
+
+	Args:
+		config: Configuracao
+
+	Returns:
+		Function: ocr(imagem, metricas=None) (ver criar_ocr)
+	'''
+	cache, duplicatas = config.cache(), config.duplicatas()
+	chave = (config.OCR_BACKEND, config.TESSERACT_CONFIG, config.OCR_REGIOES, cache and cache['pasta'], \
+			duplicatas and tuple(duplicatas.values()))
+	with TRAVA_MOTORES:
+		if chave not in MOTORES_OCR:
+			MOTORES_OCR[chave] = carregar_nucleo().criar_ocr(config.OCR_BACKEND, config.TESSERACT_CONFIG, cache, \
+					regioes=config.OCR_REGIOES, duplicatas=duplicatas)[0]
+		return MOTORES_OCR[chave]
+
+
+def process_folder(pasta, config=None, processos=1, regex=None, recursivo=False, ordenar=True, particao=(0, 1)):
+	'''
+	Trata e extrai o texto de todas as fotos de uma pasta, em ordem alfabética. As fotos são listadas sob demanda
+	(ver listar_imagens), então a primeira começa a ser tratada antes mesmo do fim da listagem quando ordenar é False
+
+	Args:
+		pasta: Caminho da pasta com as fotos
+		config: Configuracao. None usa os valores padrão
+		processos: Qtd de fotos tratadas em paralelo, cada uma em um processo com seu próprio motor de OCR
+		regex: Expressão regular que seleciona as fotos da pasta. None: as extensões aceitas pelo script
+			(EXTENSOES_IMAGENS, ver listar_imagens)
+		recursivo: Inclui as fotos das subpastas
+		ordenar: False trata as fotos na ordem do sistema de arquivos, sem ler a pasta inteira antes
+		particao: (índice, total). Trata somente a parte da pasta que cabe a esta máquina (ver listar_imagens)
+
+	Yields:
+		Tuple: (caminho da foto, texto corrigido ou None, mensagem de erro ou None), na ordem da pasta
+	'''
+	nucleo = carregar_nucleo()
+	config = config or Configuracao()
+	regexp = re.compile(regex, re.IGNORECASE) if regex else None
+	extensoes = None if regexp else nucleo.EXTENSOES_IMAGENS
+	imagens = (imagem_full_path for imagem_full_path in nucleo.listar_imagens(pasta, extensoes, recursivo, ordenar, \
+			particao=particao) if not regexp or regexp.search(imagem_full_path))
+	corrigir = criar_corretor(config)
+
+	if processos <= 1:
+		for imagem_full_path in imagens:
+			try:
+				yield imagem_full_path, process_image(imagem_full_path, config)[1], None
+			except Exception as erro:
+				yield imagem_full_path, None, f'{type(erro).__name__}: {erro}'
+		return
+
+	# Mesmo caminho do modo serviço: cada processo trata a foto e faz o OCR, sem devolver a imagem
+	from concurrent.futures import ProcessPoolExecutor
+	cache, parametros = config.cache(), config.parametros_tratamento()
+	argumentos = ((imagem_full_path, None, parametros, cache) for imagem_full_path in imagens)
+	with ProcessPoolExecutor(processos, initializer=nucleo.inicializar_processo_servico, \
+			initargs=(1, config.OCR_BACKEND, config.TESSERACT_CONFIG, cache, config.OCR_REGIOES, config.duplicatas())) as pool:
+		for imagem_full_path, texto, erro in nucleo.mapear_em_ordem(pool, nucleo.processar_pagina_servico, argumentos, 2 * processos):
+			if texto is not None and corrigir: texto = corrigir(texto)
+			yield imagem_full_path, texto, erro
+
+
+def process_image(imagem, config=None, extrair_texto=True):
+	'''
+	Trata uma foto (alinhamento, binarização e limpeza dos ruídos) e extrai o seu texto
+
+	Args:
+		imagem: Caminho da foto, ou a foto já decodificada (NumPy Array BGR ou tons de cinza)
+		config: Configuracao. None usa os valores padrão
+		extrair_texto: False retorna somente a imagem binarizada, sem carregar o OCR
+
+	Returns:
+		NumPy Array: Imagem binarizada
+		String: Texto extraído e corrigido, ou None quando extrair_texto é False
+	'''
+	nucleo = carregar_nucleo()
+	config = config or Configuracao()
+	image_bw = nucleo.tratar_imagem(imagem, None, config.parametros_tratamento(), config.cache())
+	if not extrair_texto:
+		return image_bw, None
+	texto = obter_ocr(config)(image_bw)
+	corrigir = criar_corretor(config)
+	return image_bw, (corrigir(texto) if corrigir else texto)
@@ -0,0 +1,2737 @@
+'''
+Funções do ocr-workflow: tratamento das fotos, OCR, correção do texto, cache e modo serviço.
+
+O script ocr-workflow.py traz as configurações e o fluxo principal e importa daqui as funções.
+Nenhuma função lê as configurações do script: o nível de log e os demais parâmetros são argumentos.
+Com log_level 0 (o padrão), nenhuma janela é aberta
+'''
+import contextlib, cv2 as cv, json, numpy as np, os, re, subprocess, time
+
+# Características de cada contorno encontrado em convert_bw (retângulo, círculo e contorno pai)
+CONTORNO_DTYPE = np.dtype([('x', np.int32), ('y', np.int32), ('w', np.int32), ('h', np.int32), \
+		('cx', np.int32), ('cy', np.int32), ('raio', np.int32), ('pai', np.int32)])
+
+# Registro compacto de cada contorno classificado por convert_bw, usado para desenhar as marcações de debug
+MARCACAO_DTYPE = np.dtype([('x', np.int32), ('y', np.int32), ('w', np.int32), ('h', np.int32), \
+		('cx', np.int32), ('cy', np.int32), ('raio', np.int32), ('ruido', np.bool_), ('motivo', np.int8), ('associado', np.int32)])
+
+# Motivos da classificação de um contorno em classificar_contornos
+MOTIVOS = ('default', 'hole', 'verysmall', 'far', 'close')
+
+# Deslocamento (x, y) de cada uma das 8 direções do seguidor de bordas do OpenCV, no sentido anti-horário a partir do leste
+DIRECOES_BORDA = ((1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1))
+
+# Extensões das fotos aceitas na pasta de entrada (ver listar_imagens)
+EXTENSOES_IMAGENS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff')
+
+# Formatos da imagem binarizada intermediária e o sufixo dos arquivos (ver codificar_imagem_bw)
+FORMATOS_INTERMEDIARIOS = {'png': '_BW.png', 'npy': '_BW.npy', 'nenhum': None}
+
+# PNG de 1 bit por pixel com compressão rápida: sem perdas, menor e mais rápido de gravar e ler que o PNG de 8 bits
+OPCOES_PNG_BW = [cv.IMWRITE_PNG_BILEVEL, 1, cv.IMWRITE_PNG_COMPRESSION, 1]
+
+# Incrementar sempre que um algoritmo mudar o resultado de uma etapa, invalidando o cache existente
+VERSAO_CACHE = 2
+
+# Modos de interpolação aceitos em ALINHAMENTO_INTERPOLACAO
+INTERPOLACOES = {'nearest': cv.INTER_NEAREST, 'linear': cv.INTER_LINEAR, 'cubic': cv.INTER_CUBIC, 'lanczos': cv.INTER_LANCZOS4}
+
+# Conexões abertas com o índice do cache, por pasta, processo e thread (ver abrir_cache)
+CONEXOES_CACHE = {}
+# Conexões com o índice de duplicatas e as assinaturas já carregadas em memória, por processo e thread (ver buscar_duplicata)
+CONEXOES_DUPLICATAS = {}
+INDICES_DUPLICATAS = {}
+# Qtd de bits 1 de cada valor de byte, usada na distância de Hamming entre assinaturas
+BITS_POR_BYTE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1, dtype=np.uint16)
+MEDICOES_ABERTAS = []
+
+
+def abrir_cache(cache):
+	'''
+	Abre (ou cria) o índice do cache de resultados. Cada processo / thread mantém a sua própria conexão
+
+	Args:
+		cache: Dict {'pasta': pasta do cache, 'tamanho_max': tamanho máximo em bytes}
+
+	Returns:
+		sqlite3.Connection: Conexão com o índice
+	'''
+	import sqlite3, threading
+
+	chave = (cache['pasta'], os.getpid(), threading.get_ident())
+	if chave not in CONEXOES_CACHE:
+		os.makedirs(cache['pasta'], exist_ok=True)
+		conexao = sqlite3.connect(os.path.join(cache['pasta'], 'indice.sqlite'), timeout=60, isolation_level=None)
+		conexao.execute('PRAGMA journal_mode=WAL')
+		conexao.execute('CREATE TABLE IF NOT EXISTS entradas (chave TEXT PRIMARY KEY, etapa TEXT, tamanho INTEGER, acesso REAL)')
+		conexao.execute('CREATE INDEX IF NOT EXISTS entradas_acesso ON entradas (acesso)')
+		CONEXOES_CACHE[chave] = conexao
+	return CONEXOES_CACHE[chave]
+
+
+def abrir_duplicatas(duplicatas):
+	'''
+	Abre (ou cria) o índice de duplicatas: a assinatura e o resultado do OCR de cada página já reconhecida.
+	Cada processo / thread mantém a sua própria conexão
+
+	Args:
+		duplicatas: Dict {'arquivo': arquivo SQLite do índice, 'distancia': distância máxima entre duplicatas}
+
+	Returns:
+		sqlite3.Connection: Conexão com o índice
+	'''
+	import sqlite3, threading
+
+	chave = (duplicatas['arquivo'], os.getpid(), threading.get_ident())
+	if chave not in CONEXOES_DUPLICATAS:
+		conexao = sqlite3.connect(duplicatas['arquivo'], timeout=60, isolation_level=None)
+		conexao.execute('PRAGMA journal_mode=WAL')
+		conexao.execute('CREATE TABLE IF NOT EXISTS assinaturas (id INTEGER PRIMARY KEY, configuracao TEXT, assinatura BLOB, resultado TEXT)')
+		conexao.execute('CREATE INDEX IF NOT EXISTS assinaturas_configuracao ON assinaturas (configuracao, id)')
+		CONEXOES_DUPLICATAS[chave] = conexao
+	return CONEXOES_DUPLICATAS[chave]
+
+
+def abrir_paginas(arquivo):
+	'''
+	Abre (ou cria) o arquivo SQLite com o resultado de cada página: texto, texto corrigido, confiança,
+	palavras com as suas posições, métricas, o hash dos parâmetros usados e a execução que gravou a página
+
+	Args:
+		arquivo: Caminho do arquivo. Ex: PASTA_SAIDA/PAGINAS.sqlite
+
+	Returns:
+		sqlite3.Connection: Conexão com o arquivo
+	'''
+	import sqlite3
+
+	conexao = sqlite3.connect(arquivo, timeout=60)
+	conexao.execute('PRAGMA journal_mode=WAL')
+	conexao.execute('CREATE TABLE IF NOT EXISTS paginas (nome TEXT PRIMARY KEY, texto TEXT, texto_corrigido TEXT, \
+			confianca REAL, palavras TEXT, metricas TEXT, hash_parametros TEXT, atualizado REAL, execucao TEXT)')
+	# Arquivos criados antes da coluna execucao
+	if 'execucao' not in [coluna[1] for coluna in conexao.execute('PRAGMA table_info(paginas)')]:
+		conexao.execute('ALTER TABLE paginas ADD COLUMN execucao TEXT')
+	conexao.execute('CREATE INDEX IF NOT EXISTS paginas_execucao ON paginas (execucao)')
+	return conexao
+
+
+def alinhar_imagem(imagem_full_path, parametros, cache=None, metricas=None, hash_original=None, log_level=0):
+	'''
+	Primeira parte do tratamento: lê a foto, encontra os vértices da folha e a alinha, removendo as bordas
+
+	Args:
+		imagem_full_path: Caminho completo da foto original, ou a foto já decodificada (NumPy Array BGR ou tons de cinza)
+		parametros: Dict com os parâmetros de configuração do tratamento (mesmos nomes das configurações)
+		cache: Dict {'pasta', 'tamanho_max'}. Reaproveita os vértices de execuções anteriores. None desliga o cache
+		metricas: Dict onde são registrados tempo, CPU e memória de cada etapa (ver medir). None não registra
+		hash_original: Hash da foto, quando já calculado (ver hash_imagem)
+		log_level: Com log_level > 0, mostra os vértices encontrados; com log_level >= 3, também a folha alinhada
+
+	Returns:
+		NumPy Array: Imagem alinhada em tons de cinza
+	'''
+	# Importa a imagem e converte para tons de cinza (grayscale) uma única vez, para todas as etapas.
+	# Na busca reduzida, a foto é decodificada direto em tons de cinza, sem a cópia colorida de 3 canais
+	with medir(metricas, 'leitura'):
+		if isinstance(imagem_full_path, np.ndarray):
+			image_original = imagem_full_path
+		else:
+			modo_leitura = cv.IMREAD_GRAYSCALE if parametros['VERTICES_REDUCAO'] > 1 else cv.IMREAD_COLOR
+			image_original = cv.imread(imagem_full_path, modo_leitura) # importa a imagem para uma array numpy
+			if image_original is None:
+				raise IOError(f'Não foi possível ler a imagem {imagem_full_path}')
+		image_gs = image_original if image_original.ndim == 2 else cv.cvtColor(image_original, cv.COLOR_BGR2GRAY)
+		del image_original
+
+	# Encontra os vertices da folha escaneada dentro da imagem
+	vertices = None
+	if cache:
+		# A chave combina o conteúdo da foto com os parâmetros da detecção
+		chave_vertices = chave_cache('vertices', hash_original or hash_imagem(imagem_full_path), \
+				parametros['LIMIAR_BINARIZACAO_DETECCAO_BORDAS'], parametros['VERTICES_REDUCAO'], parametros['VERTICES_REFINAR'])
+		vertices_cache = ler_cache(cache, chave_vertices)
+		if vertices_cache is not None:
+			vertices = [tuple(vertice) for vertice in json.loads(vertices_cache)]
+	if vertices is None:
+		with medir(metricas, 'calcular_vertices'):
+			vertices, image_debug, qualidade = calcular_vertices(image_gs, parametros['LIMIAR_BINARIZACAO_DETECCAO_BORDAS'], \
+					log_level, reducao=parametros['VERTICES_REDUCAO'], refinar=parametros['VERTICES_REFINAR'])
+		if min(qualidade) < parametros['VERTICES_QUALIDADE_MIN']:
+			print(f"ATENÇÃO: vértices com baixa qualidade em {nome_imagem(imagem_full_path)}: {[round(q, 2) for q in qualidade]}")
+		if log_level > 0: update_image(resize_to_screen(image_debug))
+		if cache: gravar_cache(cache, chave_vertices, 'vertices', json.dumps(vertices).encode('utf-8'))
+
+	# Define a escala da imagem alinhada. Com ALINHAMENTO_DPI, a largura da folha passa a ter a resolução desejada
+	escala = parametros['ALINHAMENTO_ESCALA']
+	if parametros['ALINHAMENTO_DPI']:
+		largura_folha = max(p[0] for p in vertices) - min(p[0] for p in vertices)
+		escala = parametros['ALINHAMENTO_DPI'] * parametros['PAGINA_LARGURA_MM'] / 25.4 / largura_folha
+
+	# Alinha e corrige as deformacoes, transformando em um retangulo perfeito, e remove as bordas na mesma operação
+	with medir(metricas, 'image_align'):
+		image_crop = image_align(image_gs, vertices, tuple(parametros['REMOVER_BORDAS']), escala, \
+				INTERPOLACOES[parametros['ALINHAMENTO_INTERPOLACAO']])
+	if log_level >= 3: update_image(resize_to_screen(image_crop))
+	return image_crop
+
+
+def antecipar(iteravel, tamanho=2):
+	'''
+	Consome um iterável em uma thread separada, mantendo até "tamanho" itens prontos.
+	Permite que uma etapa produza o próximo item enquanto a etapa seguinte processa o atual
+
+	Args:
+		iteravel: Iterável a ser consumido em segundo plano
+		tamanho: Qtd máxima de itens aguardando consumo (limita a memória)
+
+	Yields:
+		Os itens do iterável, na mesma ordem
+	'''
+	import queue, threading
+
+	fila = queue.Queue(maxsize=tamanho)
+	FIM = object()
+
+	def produzir():
+		try:
+			for item in iteravel:
+				fila.put((item, None))
+		except BaseException as erro:
+			fila.put((FIM, erro))
+			return
+		fila.put((FIM, None))
+
+	threading.Thread(target=produzir, daemon=True).start()
+	while True:
+		item, erro = fila.get()
+		if item is FIM:
+			if erro: raise erro
+			return
+		yield item
+
+
+def apagar_ruidos(image_bw, contornos, noise):
+	'''
+	'Tapa' os ruidos sobrepondo um circulo branco com raio 2 pixels maior que o do ruído
+
+	Os pixels de todos os círculos de mesmo raio são pintados de uma só vez. O formato de cada círculo vem de um único
+	cv.circle por raio, desenhado em um molde, então o resultado é o mesmo de um cv.circle por ruído
+
+	Args:
+		image_bw: Imagem binária, alterada no próprio lugar
+		contornos: Array estruturada com as características dos contornos (ver extrair_contornos)
+		noise: Array booleana indicando os contornos considerados ruído (ver classificar_contornos)
+	'''
+	WHITE = 255
+	ruidos = contornos[noise]
+	if not len(ruidos): return
+	altura, largura = image_bw.shape[:2]
+	pixels = image_bw.reshape(-1) if image_bw.flags.c_contiguous else None
+	for raio in np.unique(ruidos['raio']).tolist():
+		# Deslocamentos de todos os pixels do círculo em relação ao centro
+		margem = raio + 2
+		molde = np.zeros((2 * margem + 1, 2 * margem + 1), np.uint8)
+		cv.circle(molde, (margem, margem), margem, WHITE, -1)
+		dy, dx = np.nonzero(molde)
+		dy -= margem; dx -= margem
+
+		mesmo_raio = ruidos[ruidos['raio'] == raio]
+		cx = mesmo_raio['cx']; cy = mesmo_raio['cy']
+		# Círculos inteiros dentro da imagem são pintados pelo índice linear de cada pixel, sem conferir os limites
+		# (somente quando a imagem é contígua, senão reshape criaria uma cópia)
+		interno = (cx >= margem) & (cx < largura - margem) & (cy >= margem) & (cy < altura - margem) & image_bw.flags.c_contiguous
+		centros = cy[interno].astype(np.int64) * largura + cx[interno]
+		if len(centros): pixels[(centros[:, None] + (dy * largura + dx)).ravel()] = WHITE
+		if not interno.all():
+			linhas = (cy[~interno][:, None] + dy).ravel(); colunas = (cx[~interno][:, None] + dx).ravel()
+			dentro = (linhas >= 0) & (linhas < altura) & (colunas >= 0) & (colunas < largura)
+			image_bw[linhas[dentro], colunas[dentro]] = WHITE
+
+
+def armazenar_textos(conexao, textos, hash_parametros, metricas=None, corrigir=None, lote=100, execucao=None):
+	'''
+	Grava as páginas no arquivo de páginas (ver abrir_paginas) à medida que o OCR as entrega, em lotes
+
+	Args:
+		conexao: Conexão retornada por abrir_paginas
+		textos: Iterável de tuples (nome, (texto, palavras)), como retornado por extrair_textos com palavras
+		hash_parametros: Hash dos parâmetros do tratamento e do OCR, gravado junto com cada página
+		metricas: Dict {nome: métricas da página} (ver medir). As métricas são gravadas junto com cada página
+		corrigir: Função retornada por compilar_correcoes. None não grava o texto corrigido
+		lote: Qtd de páginas gravadas por transação
+		execucao: Identificador da execução, gravado junto com cada página (ver exportar_texto)
+	'''
+	paginas = []
+	for nome, (texto, palavras) in textos:
+		metricas_pagina = None if metricas is None else metricas.setdefault(nome, {})
+		texto_corrigido = None
+		if corrigir:
+			# As correções são aplicadas página a página, assim que o texto fica pronto
+			with medir(metricas_pagina, 'corrige_texto'):
+				texto_corrigido = corrigir(texto)
+		paginas.append({'nome': nome, 'texto': texto, 'texto_corrigido': texto_corrigido, 'palavras': palavras, \
+				'metricas': metricas_pagina, 'hash_parametros': hash_parametros, 'execucao': execucao})
+		if len(paginas) >= lote:
+			gravar_paginas(conexao, paginas)
+			paginas = []
+	gravar_paginas(conexao, paginas)
+
+
+def assinatura_imagem(image_bw):
+	'''
+	Assinatura perceptual (pHash) da página binarizada: 256 bits que indicam quais das frequências mais baixas
+	da página reduzida a 64 x 64 pixels estão acima da mediana. Fotos diferentes da mesma folha, já alinhadas,
+	geram assinaturas a poucos bits de distância, mesmo com enquadramento, iluminação e ruídos diferentes
+
+	Args:
+		image_bw: NumPy Array com a imagem binarizada
+
+	Returns:
+		Bytes: Assinatura com 32 bytes
+	'''
+	reduzida = cv.resize(image_bw, (64, 64), interpolation=cv.INTER_AREA).astype(np.float32)
+	frequencias = cv.dct(reduzida)[:16, :16].ravel()
+	return np.packbits(frequencias > np.median(frequencias[1:])).tobytes()
+
+
+def avaliar_candidato(candidato):
+	'''
+	Binariza as páginas da amostra com um conjunto de parâmetros e pontua o texto extraído
+	(executado nos processos da calibração, ver inicializar_processo_calibracao)
+
+	A imagem suavizada e a limiarizada, com seus contornos, ficam guardadas no processo. Assim, candidatos que
+	mudam somente os parâmetros de ruído reaproveitam a binarização, e imagens finais idênticas não repetem o OCR
+
+	Args:
+		candidato: Dict com os parâmetros de binarização e ruído (mesmos nomes das configurações)
+
+	Returns:
+		Dict: O próprio candidato
+		Float: Pontuação média das páginas (ver pontuar_texto)
+	'''
+	processo = CALIBRACAO_PROCESSO
+	pontuacoes = []
+	for indice, image_crop in enumerate(processo['paginas']):
+		chave_blur = (indice, candidato['BINARIZACAO_BLUR'])
+		chave_limiar = chave_blur + (candidato['BINARIZACAO_BLOCKSIZE'], candidato['BINARIZACAO_LIMIAR'])
+		if chave_limiar in processo['limiarizadas']:
+			processo['limiarizadas'].move_to_end(chave_limiar)
+		else:
+			if chave_blur not in processo['suavizadas']:
+				processo['suavizadas'][chave_blur] = cv.GaussianBlur(image_crop, (chave_blur[1], chave_blur[1]), 0)
+			image_limiar = cv.adaptiveThreshold(processo['suavizadas'][chave_blur], 255, cv.ADAPTIVE_THRESH_MEAN_C, \
+					cv.THRESH_BINARY, chave_limiar[2], chave_limiar[3])
+			contours, hierarchy = cv.findContours(image_limiar, cv.RETR_TREE, cv.CHAIN_APPROX_SIMPLE)
+			processo['limiarizadas'][chave_limiar] = (image_limiar, extrair_contornos(contours, hierarchy))
+			# Mantém somente as binarizações mais recentes, para limitar a memória de cada processo
+			while len(processo['limiarizadas']) > 4 * len(processo['paginas']):
+				processo['limiarizadas'].popitem(last=False)
+		image_limiar, contornos = processo['limiarizadas'][chave_limiar]
+
+		# Mesma sequência de convert_bw a partir dos contornos
+		noise, _, _ = classificar_contornos(contornos, candidato['NOISE_VERYSMALL'], candidato['NOISE_SMALL'], \
+				candidato['NOISE_ISOLATION_MIN'], candidato['CHAR_RADIUS_MIN'], candidato['NOISE_ISOLATION_MIN'] * 2)
+		image_bw = image_limiar.copy()
+		apagar_ruidos(image_bw, contornos, noise)
+
+		chave_ocr = hash_imagem(image_bw)
+		if chave_ocr not in processo['pontuacoes']:
+			texto, confiancas = processo['ocr'](image_bw)
+			processo['pontuacoes'][chave_ocr] = pontuar_texto(texto, confiancas, processo['dicionario'])
+		pontuacoes.append(processo['pontuacoes'][chave_ocr])
+	return candidato, sum(pontuacoes) / len(pontuacoes)
+
+
+def binarizar_faixas(image_gs, blursize, blocksize, limiar, altura_faixa):
+	'''
+	Blur e threshold adaptativo em faixas horizontais. Cada faixa é lida com uma margem de blursize / 2 + blocksize / 2
+	linhas, o alcance dos dois filtros somados, então as suas linhas recebem exatamente os valores da imagem inteira.
+	As cópias temporárias têm o tamanho de uma faixa, e não o da imagem
+
+	Args:
+		image_gs: Imagem em grayscale
+		blursize, blocksize, limiar: Mesmos parâmetros de convert_bw
+		altura_faixa: Qtd de linhas de cada faixa
+
+	Returns:
+		NumPy Array: Imagem binária, igual à de cv.adaptiveThreshold(cv.GaussianBlur(image_gs))
+	'''
+	altura = image_gs.shape[0]
+	margem = blursize // 2 + blocksize // 2
+	image_bw = np.empty(image_gs.shape[:2], np.uint8)
+	for inicio in range(0, altura, altura_faixa):
+		fim = min(altura, inicio + altura_faixa)
+		topo = max(0, inicio - margem)
+		blurred = cv.GaussianBlur(image_gs[topo:min(altura, fim + margem)], (blursize, blursize), 0)
+		faixa_bw = cv.adaptiveThreshold(blurred, 255, cv.ADAPTIVE_THRESH_MEAN_C, cv.THRESH_BINARY, blocksize, limiar)
+		image_bw[inicio:fim] = faixa_bw[inicio - topo:fim - topo]
+	return image_bw
+
+
+def buscar_duplicata(duplicatas, configuracao, assinatura):
+	'''
+	Procura, entre as páginas já reconhecidas com a mesma configuração do OCR (nesta e em execuções anteriores),
+	a página com a assinatura mais próxima. As assinaturas ficam em memória, lado a lado em uma única matriz,
+	e a cada busca só as gravadas depois da anterior são lidas do índice. Assim cada busca é uma única operação
+	vetorizada, que compara centenas de milhares de páginas em dezenas de milissegundos
+
+	Args:
+		duplicatas: Dict {'arquivo', 'distancia'} (ver abrir_duplicatas)
+		configuracao: Chave da configuração do OCR (ver chave_cache). Só páginas da mesma configuração são comparadas
+		assinatura: Assinatura da página (ver assinatura_imagem)
+
+	Returns:
+		String: Resultado do OCR gravado para a página mais próxima, ou None quando nenhuma estiver
+			a até duplicatas['distancia'] bits de distância
+	'''
+	import threading
+
+	conexao = abrir_duplicatas(duplicatas)
+	chave = (duplicatas['arquivo'], configuracao, os.getpid(), threading.get_ident())
+	indice = INDICES_DUPLICATAS.setdefault(chave, {'ids': np.zeros(0, np.int64), 'assinaturas': np.zeros((0, 32), np.uint8), 'total': 0})
+	total = indice['total']
+	ultimo = int(indice['ids'][total - 1]) if total else 0
+	novas = conexao.execute('SELECT id, assinatura FROM assinaturas WHERE configuracao = ? AND id > ? ORDER BY id', \
+			(configuracao, ultimo)).fetchall()
+	if novas:
+		# A capacidade dobra quando falta espaço, para que o índice não seja copiado a cada página nova
+		if total + len(novas) > len(indice['ids']):
+			capacidade = max(total + len(novas), 2 * len(indice['ids']), 1024)
+			indice['ids'] = np.concatenate([indice['ids'][:total], np.zeros(capacidade - total, np.int64)])
+			indice['assinaturas'] = np.concatenate([indice['assinaturas'][:total], np.zeros((capacidade - total, 32), np.uint8)])
+		indice['ids'][total:total + len(novas)] = [id_assinatura for id_assinatura, _ in novas]
+		indice['assinaturas'][total:total + len(novas)] = np.frombuffer(b''.join(valor for _, valor in novas), np.uint8).reshape(-1, 32)
+		total = indice['total'] = total + len(novas)
+	if not total:
+		return None
+
+	# Distância de Hamming entre a assinatura e todas as páginas do índice
+	distancias = BITS_POR_BYTE[indice['assinaturas'][:total] ^ np.frombuffer(assinatura, np.uint8)].sum(axis=1)
+	mais_proxima = int(np.argmin(distancias))
+	if distancias[mais_proxima] > duplicatas['distancia']:
+		return None
+	return conexao.execute('SELECT resultado FROM assinaturas WHERE id = ?', (int(indice['ids'][mais_proxima]),)).fetchone()[0]
+
+
+def calcular_vertices(image, limiar, log_level=0, reducao=1, refinar=True):
+	'''
+	Procura por um quadrilátero de cor clara sobre um fundo escuro (pagina escaneada)
+	Cada vertice deste quadrilatero precisa estar em um quadrante da foto
+	Aqui a abordagem é diferente de outros métodos:
+	Depois de achar os pontos referentes ao contorno da página escaneada,
+	seleciona-se os que estiverem mais próximos aos 4 vértices da imagem
+	Essa abordagem funciona muito bem para páginas fotografadas, onde os cantos
+	da folha não são perfeitamente retos
+
+	Com reducao > 1, a busca é feita em uma cópia reduzida da imagem e os vértices encontrados
+	são levados de volta para a resolução original (e opcionalmente refinados nela)
+
+	Args:
+		image: Array NumPy contendo a imagem (colorida ou já em tons de cinza)
+		limiar: Abaixo desse valor, o pixel da imagem sera convertido para 0 na binarização
+		log_level: Com log_level >= 1, plota os vértices na imagem de conferência e os imprime
+		reducao: Fator de redução da imagem usada na busca (1: resolução original)
+		refinar: Com reducao > 1, reposiciona cada vértice em uma pequena janela da imagem original
+
+	Returns:
+		Array: Coordenadas dos 4 vértices. Canto Sup Esq. Sentido Horário.
+		NumPy Array: Imagem com as marcações plotadas para conferência (na resolução da busca)
+		Array: Qualidade de cada vértice de 0 a 1, na mesma ordem (ver qualidade_vertices)
+	'''
+
+	# Define as cores das marcaçoes
+	GREEN=(0,255,0); PURPLE=(255,0,255)
+
+	# Dimensões da imagem
+	altura_original, largura_original = image.shape[:2]
+	print(f"Dimensões da imagem: {altura_original} x {largura_original}" )
+
+	# Converte a imagem para tons de cinza, caso ainda não esteja
+	imageGray = image if image.ndim == 2 else cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+	image_gs = imageGray
+
+	# Reduz a imagem. A página ocupa quase toda a foto, então sua forma sobrevive bem à redução
+	if reducao > 1:
+		imageGray = cv.resize(image_gs, (max(1, largura_original // reducao), max(1, altura_original // reducao)), \
+				interpolation=cv.INTER_AREA)
+		print(f"Procurando os vértices em uma imagem reduzida {reducao}x")
+	height, width = imageGray.shape[:2]
+
+	# Binariza a imagem
+	print(f"Convertendo imagem para preto e branco com limiar = {limiar}")
+	_, image_bw = cv.threshold(imageGray, limiar, 255, cv.THRESH_BINARY)
+
+	# Copia a imagem binarizada para uma imagem colorida. (As marcacoes posteriores serão coloridas).
+	image_debug = cv.cvtColor(image_bw, cv.COLOR_GRAY2BGR)
+
+	# Encontra os contornos externos
+	contours, _ = cv.findContours(image_bw, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+
+	# Encontra o maior contorno (pagina escaneada)
+	largest_contour = max(contours, key=cv.contourArea)
+
+	# Plota o contorno na imagem de conferência
+	cv.drawContours(image_debug, largest_contour, -1, PURPLE, round(0.005 * width))
+
+	# Encontra os vértices da imagem de origem
+	image_corners = np.array([(0, 0), (width - 1, 0), (width - 1, height - 1), (0, height - 1)], dtype=np.int64)
+
+	# Calcula, de uma só vez, a distância de cada ponto do contorno até as quatro extremidades da imagem
+	pontos = largest_contour[:, 0, :].astype(np.int64)
+	distances = np.sqrt(((pontos[:, None, :] - image_corners[None, :, :]) ** 2).sum(axis=2))
+	# Associa cada ponto à extremidade mais próxima
+	closest_corner_index = np.argmin(distances, axis=1)
+	closest_distance = distances[np.arange(len(pontos)), closest_corner_index]
+
+	# Para cada extremidade, seleciona o ponto associado mais próximo (o primeiro do contorno, em caso de empate)
+	indices = []; cantos_encontrados = []
+	for canto in range(4):
+		associados = np.flatnonzero(closest_corner_index == canto)
+		if len(associados):
+			indices.append(int(associados[np.argmin(closest_distance[associados])]))
+			cantos_encontrados.append(canto)
+	closest_points = pontos[indices].tolist()
+
+	# Avalia a qualidade de cada vértice, para que detecções ruins possam ser sinalizadas
+	qualidade = qualidade_vertices(pontos, indices, cantos_encontrados)
+
+	# Transforma as coordenadas encontradas em numeros inteiros
+	vertices = list(map(lambda item: (round(item[0]), round(item[1])), closest_points))
+
+	# plota os vertices encontrados na imagem de debug
+	if log_level >= 1:
+		for point in vertices:
+			image_debug = cv.circle(image_debug, (round(point[0]), round(point[1])), round(0.01 * width), GREEN, round(0.003 * width))
+
+	if reducao > 1:
+		# Leva cada vértice para o centro do bloco de pixels originais que ele representa
+		escala_x = largura_original / width; escala_y = altura_original / height
+		vertices = [(min(largura_original - 1, round((x + 0.5) * escala_x - 0.5)), \
+				min(altura_original - 1, round((y + 0.5) * escala_y - 0.5))) for x, y in vertices]
+		if refinar:
+			cantos = [(0, 0), (largura_original - 1, 0), (largura_original - 1, altura_original - 1), (0, altura_original - 1)]
+			raio = 4 * int(np.ceil(max(escala_x, escala_y)))
+			vertices = [refinar_vertice(image_gs, vertice, cantos[canto], limiar, raio) \
+					for vertice, canto in zip(vertices, cantos_encontrados)]
+
+	if log_level >= 1: print(f"Vertices detectados: {vertices} Qualidade: {[round(q, 2) for q in qualidade]}")
+
+	return vertices, image_debug, qualidade
+
+
+def calibrar_parametros(imagens_full_path, parametros, valores, processos=1, backend='auto', tesseract_config='', \
+		dicionario='', pasta='calibracao', cache=None, rodadas=3):
+	'''
+	Procura os parâmetros de binarização e de remoção de ruídos que produzem o melhor texto em uma amostra de páginas,
+	sem janelas de debug. Os parâmetros são ajustados um de cada vez (os demais fixos), testando em paralelo todos os
+	valores sugeridos, e o ciclo se repete enquanto houver melhora
+
+	As páginas são alinhadas uma única vez e guardadas em "pasta" (.npy). Execuções seguintes com as mesmas fotos
+	e os mesmos parâmetros de alinhamento partem direto das imagens alinhadas
+
+	Args:
+		imagens_full_path: Fotos da amostra
+		parametros: Dict com os parâmetros de tratamento atuais, ponto de partida da busca
+		valores: Dict {parâmetro: lista de valores a testar}. Ex: {'BINARIZACAO_LIMIAR': [10, 15, 20]}
+		processos: Qtd de processos que avaliam os candidatos em paralelo
+		backend: Backend de OCR (ver criar_ocr)
+		tesseract_config: Parâmetros no formato da linha de comando do tesseract
+		dicionario: Arquivo com uma palavra por linha. Vazio pontua pela confiança do OCR (ver pontuar_texto)
+		pasta: Pasta onde as imagens alinhadas são guardadas
+		cache: Dict {'pasta', 'tamanho_max'} do cache de resultados (reaproveita os vértices), ou None
+		rodadas: Qtd máxima de ciclos sobre todos os parâmetros
+
+	Returns:
+		Dict: Parâmetros de tratamento com os melhores valores encontrados
+		Float: Pontuação obtida com eles
+	'''
+	from concurrent.futures import ProcessPoolExecutor
+
+	os.makedirs(pasta, exist_ok=True)
+	alinhamento = sorted((nome, valor) for nome, valor in parametros.items() \
+			if not nome.startswith(('BINARIZACAO_', 'NOISE_', 'CHAR_')) and nome != 'VERTICES_QUALIDADE_MIN')
+	paginas = []
+	for imagem_full_path in imagens_full_path:
+		hash_original = hash_imagem(imagem_full_path)
+		arquivo = os.path.join(pasta, chave_cache('alinhada', hash_original, alinhamento) + '.npy')
+		if not os.path.exists(arquivo):
+			print(f"Calibração: alinhando {imagem_full_path}")
+			try:
+				image_crop = alinhar_imagem(imagem_full_path, parametros, cache, hash_original=hash_original)
+			except Exception as erro:
+				print(f'FALHA NO TRATAMENTO DA IMAGEM: {imagem_full_path} ({type(erro).__name__}: {erro})')
+				continue
+			np.save(arquivo + '.tmp.npy', image_crop)
+			os.replace(arquivo + '.tmp.npy', arquivo)
+		paginas.append(arquivo)
+	if not paginas:
+		raise ValueError('Nenhuma foto da amostra pôde ser alinhada')
+
+	# Valores inválidos para o OpenCV (blur e bloco precisam ser ímpares) são descartados
+	validos = {
+		'BINARIZACAO_BLUR': lambda valor: valor >= 1 and valor % 2 == 1,
+		'BINARIZACAO_BLOCKSIZE': lambda valor: valor >= 3 and valor % 2 == 1,
+	}
+	valores = {nome: [valor for valor in lista if validos.get(nome, lambda valor: True)(valor)] for nome, lista in valores.items()}
+
+	melhores = {nome: parametros[nome] for nome in ('BINARIZACAO_BLUR', 'BINARIZACAO_BLOCKSIZE', 'BINARIZACAO_LIMIAR', \
+			'NOISE_VERYSMALL', 'NOISE_SMALL', 'NOISE_ISOLATION_MIN', 'CHAR_RADIUS_MIN')}
+	os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+	print(f'Calibração: {len(paginas)} páginas, {processos} processos')
+	with ProcessPoolExecutor(max_workers=processos, initializer=inicializar_processo_calibracao, \
+			initargs=(paginas, backend, tesseract_config, dicionario)) as pool:
+		_, melhor_pontuacao = pool.submit(avaliar_candidato, melhores).result()
+		print(f'Calibração: pontuação inicial {melhor_pontuacao:.2f}')
+		for rodada in range(rodadas):
+			melhorou = False
+			for nome, lista in valores.items():
+				candidatos = [dict(melhores, **{nome: valor}) for valor in lista if valor != melhores[nome]]
+				for candidato, pontuacao in pool.map(avaliar_candidato, candidatos):
+					if pontuacao > melhor_pontuacao:
+						melhores, melhor_pontuacao, melhorou = candidato, pontuacao, True
+				print(f'Calibração: rodada {rodada + 1}, {nome} = {melhores[nome]} (pontuação {melhor_pontuacao:.2f})')
+			if not melhorou: break
+
+	return dict(parametros, **melhores), melhor_pontuacao
+
+
+def carregar_imagem_bw(imagem):
+	'''
+	Retorna a imagem binarizada, lendo o arquivo somente quando for recebido um caminho
+
+	Args:
+		imagem: Caminho completo da imagem ou a própria imagem (NumPy Array)
+
+	Returns:
+		NumPy Array: Imagem em grayscale
+	'''
+	if isinstance(imagem, str):
+		if imagem.endswith('.npy'):
+			# Os bits são lidos direto do arquivo (memory map) e expandidos em uma única cópia: 1 (tinta) => 0, 0 => 255.
+			# A primeira linha guarda a largura real da imagem (ver codificar_imagem_bw)
+			bits = np.load(imagem, mmap_mode='r')
+			largura = int.from_bytes(bits[0].tobytes(), 'little')
+			image_bw = np.unpackbits(bits[1:], axis=1, count=largura)
+			image_bw -= 1
+			return image_bw
+		return cv.imread(imagem, cv.IMREAD_GRAYSCALE)
+	return imagem
+
+
+def chave_cache(etapa, *partes):
+	'''
+	Gera a chave de um resultado no cache a partir da etapa e de tudo o que o influencia
+	(hash da entrada e parâmetros da etapa)
+
+	Args:
+		etapa: Nome da etapa. Ex: 'vertices', 'bw', 'ocr'
+		partes: Hash da entrada e parâmetros da etapa (qualquer valor representável por repr)
+
+	Returns:
+		String: Chave hexadecimal
+	'''
+	import hashlib
+
+	return hashlib.blake2b(repr((VERSAO_CACHE, etapa) + partes).encode('utf-8'), digest_size=20).hexdigest()
+
+
+def classificar_contornos(contornos, noise_verysmall, noise_small, noise_dist_min, char_radius_min, char_radius_max, lote=4096):
+	'''
+	Determina quais contornos são ruído, todos de uma só vez através de máscaras NumPy
+
+	Regras, na ordem em que são aplicadas:
+		hole: Buracos são mantidos. Ex: triangulo dentro da letra "A"
+		verysmall: Contornos com raio até noise_verysmall são ruído
+		far / close: Contornos com raio até noise_small são ruído somente se não houver
+			um caractere a até noise_dist_min pixels (X e Y). Ex: o ponto da letra "i"
+		default: Os demais são mantidos
+
+	Args:
+		contornos: Array estruturada gerada por extrair_contornos
+		noise_verysmall: Raio maximo para ser considerado ruido
+		noise_small: Raio maximo de um contorno isolado
+		noise_dist_min: Isolamente mínimo X e Y de outros objetos
+		char_radius_min: Raio minimo de um caractere (Ex. Ponto)
+		char_radius_max: Raio maximo de um caractere (Ex. Fonte de títulos)
+		lote: Qtd de contornos pequenos consultados por vez no índice espacial (limita a memória)
+
+	Returns:
+		NumPy Array (bool): True para os contornos considerados ruído
+		NumPy Array (int8): Motivo de cada classificação, indice de MOTIVOS
+		NumPy Array (int32): ID do contorno associado (pai do buraco ou caractere próximo), -1 quando não houver
+	'''
+	raio = contornos['raio']; pai = contornos['pai']
+	motivo = np.zeros(len(contornos), dtype=np.int8)
+	associado = np.full(len(contornos), -1, dtype=np.int32)
+
+	# Buracos são desconsiderados, pois precisam ser mantidos
+	hole = (pai > 0) & (raio[np.maximum(pai, 0)] < char_radius_max)
+	motivo[hole] = MOTIVOS.index('hole'); associado[hole] = pai[hole]
+
+	# Contornos muito pequenos são imediatamente considerados ruído
+	verysmall = ~hole & (raio <= noise_verysmall)
+	motivo[verysmall] = MOTIVOS.index('verysmall')
+
+	# Contornos pequenos precisam estar longe de qualquer caractere para serem considerados ruído
+	pequenos = np.flatnonzero(~hole & ~verysmall & (raio <= noise_small))
+	motivo[pequenos] = MOTIVOS.index('far')
+	if len(pequenos):
+		indice = indexar_centros(contornos, char_radius_min, noise_dist_min)
+		colunas = indice['colunas']; chaves_ordenadas = indice['chaves_ordenadas']; ids = indice['ids']
+		deslocamentos = np.array([dl * colunas + dc for dl in (-1, 0, 1) for dc in (-1, 0, 1)], dtype=np.int64)
+		for inicio_lote in range(0, len(pequenos), lote):
+			consulta = pequenos[inicio_lote:inicio_lote + lote]
+			# Faixa [inicio, fim) de caracteres indexados em cada uma das 9 células vizinhas
+			vizinhas = (indice['chaves'][consulta][:, None] + deslocamentos).ravel()
+			inicio = np.searchsorted(chaves_ordenadas, vizinhas, 'left')
+			qtd = np.searchsorted(chaves_ordenadas, vizinhas, 'right') - inicio
+			# Expande as faixas em pares (contorno pequeno, caractere candidato)
+			total = int(qtd.sum())
+			if not total: continue
+			origem = np.repeat(np.repeat(consulta, 9), qtd)
+			posicao = np.arange(total) - np.repeat(np.cumsum(qtd) - qtd, qtd) + np.repeat(inicio, qtd)
+			candidato = ids[posicao]
+			perto = (candidato != origem) \
+					& (np.abs(contornos['cx'][candidato] - contornos['cx'][origem]) <= noise_dist_min) \
+					& (np.abs(contornos['cy'][candidato] - contornos['cy'][origem]) <= noise_dist_min)
+			if not perto.any(): continue
+			# Mantém o menor id entre os caracteres próximos, como na varredura sequencial
+			origem = origem[perto]; candidato = candidato[perto]
+			ordem = np.lexsort((candidato, origem))
+			origem = origem[ordem]; candidato = candidato[ordem]
+			primeiro = np.ones(len(origem), dtype=bool); primeiro[1:] = origem[1:] != origem[:-1]
+			motivo[origem[primeiro]] = MOTIVOS.index('close'); associado[origem[primeiro]] = candidato[primeiro]
+
+	noise = verysmall | (motivo == MOTIVOS.index('far'))
+	return noise, motivo, associado
+
+
+def codificar_imagem_bw(image_bw, arquivo):
+	'''
+	Codifica a imagem binarizada no formato indicado pela extensão do arquivo (ver carregar_imagem_bw)
+
+	Formatos:
+		.png: PNG de 1 bit por pixel, com compressão rápida
+		.npy: 1 bit por pixel (np.packbits, 1 = tinta), sem compressão. Mais rápido de gravar e de ler, pois é
+			lido com memory map. Uma linha extra, no início, guarda a largura real da imagem, já que o packbits
+			completa cada linha até um múltiplo de 8 colunas
+
+	Args:
+		image_bw: Imagem binarizada (0 e 255)
+		arquivo: Caminho do arquivo a ser gravado
+
+	Returns:
+		Bytes: Conteúdo do arquivo
+	'''
+	if arquivo.endswith('.npy'):
+		import io
+		buffer = io.BytesIO()
+		bits = np.packbits(image_bw == 0, axis=1)
+		# A largura sempre cabe na linha: uma linha de n bytes representa até 8n colunas, bem menos que 256^n
+		cabecalho = np.frombuffer(image_bw.shape[1].to_bytes(bits.shape[1], 'little'), np.uint8)
+		np.save(buffer, np.vstack((cabecalho, bits)))
+		return buffer.getvalue()
+	return cv.imencode('.png', image_bw, OPCOES_PNG_BW)[1].tobytes()
+
+
+def compilar_correcoes(replacements):
+	'''
+	Prepara as regras de correção uma única vez, para serem aplicadas em muitas páginas (ver corrige_texto)
+
+	Regras que apenas trocam caracteres por um texto fixo (ex: padronizar as aspas ou remover o \\u000c) são agrupadas
+	em uma única tabela do str.translate, aplicada em uma só passada. As demais são compiladas e aplicadas
+	com re.sub, na mesma ordem, mantendo o suporte a back reference e a lambdas
+
+	Args:
+		replacements: Dict {pattern (regex): replacement (string, string com back reference ou função)}
+
+	Returns:
+		Function: Recebe um texto e retorna o texto com as substituições aplicadas
+	'''
+	try:
+		import re._parser as sre_parse
+	except ImportError:
+		import sre_parse
+
+	def caracteres_literais(pattern):
+		# Conjunto de caracteres quando o pattern é um único caractere ou uma classe de caracteres sem flags
+		if not isinstance(pattern, str) or re.compile(pattern).flags & re.IGNORECASE:
+			return None
+		itens = list(sre_parse.parse(pattern))
+		if len(itens) != 1:
+			return None
+		operacao, valor = itens[0]
+		if operacao == sre_parse.LITERAL:
+			return [chr(valor)]
+		if operacao != sre_parse.IN:
+			return None
+		caracteres = []
+		for operacao, valor in valor:
+			if operacao == sre_parse.LITERAL:
+				caracteres.append(chr(valor))
+			elif operacao == sre_parse.RANGE and valor[1] - valor[0] < 256:
+				caracteres.extend(chr(codigo) for codigo in range(valor[0], valor[1] + 1))
+			else:
+				return None
+		return caracteres
+
+	etapas = []
+	for pattern, replacement in replacements.items():
+		caracteres = None
+		if isinstance(replacement, str) and '\\' not in replacement:
+			caracteres = caracteres_literais(pattern)
+		if caracteres is None:
+			etapas.append((re.compile(pattern), replacement))
+			continue
+		# Regras literais seguidas são combinadas em uma tabela só, com o mesmo resultado da aplicação em sequência
+		if not etapas or not isinstance(etapas[-1], dict):
+			etapas.append({})
+		tabela = etapas[-1]
+		mapa = dict.fromkeys(caracteres, replacement)
+		for caractere in list(tabela):
+			tabela[caractere] = ''.join(mapa.get(c, c) for c in tabela[caractere])
+		for caractere in caracteres:
+			tabela.setdefault(caractere, replacement)
+
+	etapas = [str.maketrans(etapa) if isinstance(etapa, dict) else etapa for etapa in etapas]
+
+	def corrigir(texto):
+		for etapa in etapas:
+			if isinstance(etapa, dict):
+				texto = texto.translate(etapa)
+			else:
+				texto = etapa[0].sub(etapa[1], texto)
+		return texto
+	return corrigir
+
+
+def contar(metricas, nome, quantidade):
+	'''
+	Acumula um contador nas métricas de uma página (ex: qtd de contornos). Não faz nada quando metricas for None
+
+	Args:
+		metricas: Dict de métricas da página (ver medir) ou None
+		nome: Nome do contador
+		quantidade: Valor a ser somado
+	'''
+	if metricas is None: return
+	contadores = metricas.setdefault('contadores', {})
+	contadores[nome] = contadores.get(nome, 0) + quantidade
+
+
+def contornos_faixas(image_bw, altura_faixa, margem):
+	'''
+	Mesmos contornos de extrair_contornos(*cv.findContours(image_bw, cv.RETR_TREE, cv.CHAIN_APPROX_SIMPLE)), mas
+	procurados em faixas horizontais, sem a cópia da imagem inteira que o findContours faz
+
+	Cada faixa é lida com uma margem de linhas acima e abaixo, e fica com os contornos que começam nela e que cabem
+	inteiros na faixa com margem. Os componentes (brancos com vizinhança 8, pretos com vizinhança 4) que cruzam as
+	divisões entre faixas são unidos de uma faixa para a outra, e a borda dos que não couberem em nenhuma faixa é
+	seguida direto na imagem (ver seguir_borda). Os contornos são os mesmos do findContours e o contorno 0 também
+	(ver classificar_contornos). A ordem dos demais é outra, e o pai só é preservado quando cabe inteiro em uma faixa
+	(senão fica -1), o que basta para a classificação quando a margem é maior que os caracteres
+
+	Args:
+		image_bw: Imagem binária
+		altura_faixa: Qtd de linhas de cada faixa
+		margem: Qtd de linhas lidas acima e abaixo de cada faixa
+
+	Returns:
+		NumPy Array: Uma linha por contorno com os campos x, y, w, h, cx, cy, raio e pai (ver extrair_contornos)
+	'''
+	altura, largura = image_bw.shape[:2]
+	tabelas, chaves, chaves_pai, externos, inicios = [], [], [], [], []
+
+	# Peças dos componentes que tocam as divisões, e a união das peças de um mesmo componente (union-find)
+	pecas = []          # [cor (0 branco, 1 preto), topo, base, (y, x) do primeiro pixel, toca a moldura, oeste]
+	pais = []
+
+	def raiz(i):
+		while pais[i] != i:
+			pais[i] = pais[pais[i]]; i = pais[i]
+		return i
+
+	def limites(inicio):
+		return max(0, inicio - margem), min(altura, inicio + altura_faixa + margem)
+
+	def moldura(inicio, estatistica):
+		x0, y0, w, h = estatistica[:4].tolist()
+		return x0 == 0 or x0 + w == largura or inicio + y0 == 0 or inicio + y0 + h == altura
+
+	def oeste(rotulos, estatisticas, pecas_preto, inicio, y, x):
+		# Fundo à esquerda do primeiro pixel de um componente branco: a peça que cruza uma divisão, ou se toca a moldura
+		if x == 0: return True
+		rotulo = rotulos[y - inicio, x - 1]
+		if pecas_preto[rotulo] >= 0: return int(pecas_preto[rotulo])
+		return moldura(inicio, estatisticas[rotulo])
+
+	def rotular(faixa_bw, inicio, fim, cor, conectividade):
+		# Registra as peças das linhas de divisão. A imagem de rótulos (int32) é devolvida para as consultas da faixa,
+		# junto com as peças da primeira e da última linha
+		n, rotulos, estatisticas, _ = cv.connectedComponentsWithStats(faixa_bw, connectivity=conectividade)
+		pecas_faixa = np.full(n, -1, np.int64)
+		divisas = [linha for linha, divisa in ((rotulos[0], inicio > 0), (rotulos[-1], fim < altura)) if divisa]
+		for rotulo in np.unique(np.concatenate(divisas)).tolist() if divisas else []:
+			if rotulo == 0: continue
+			y0 = int(estatisticas[rotulo, cv.CC_STAT_TOP])
+			x0 = int(np.argmax(rotulos[y0] == rotulo))
+			pecas_faixa[rotulo] = len(pecas); pais.append(len(pecas))
+			pecas.append([cor, inicio + y0, inicio + y0 + int(estatisticas[rotulo, cv.CC_STAT_HEIGHT]) - 1, \
+					(inicio + y0, x0), moldura(inicio, estatisticas[rotulo]), None])
+		return pecas_faixa, rotulos, estatisticas, pecas_faixa[rotulos[0]], pecas_faixa[rotulos[-1]]
+
+	def rotular_faixa(inicio, fim, primeira_peca, iniciais):
+		# Rotula as linhas da faixa, sem margem, uma cor de cada vez: cada imagem de rótulos só existe dentro desta função
+		# e a dos brancos é descartada antes da dos pretos ser criada, então há no máximo uma na memória.
+		# Retorna (divisa, final) de cada cor e o oeste de cada ponto inicial (None para os buracos)
+		_, _, _, divisa_branco, final_branco = rotular(image_bw[inicio:fim], inicio, fim, 0, 8)
+		pecas_preto, rotulos, estatisticas, divisa_preto, final_preto = \
+				rotular(cv.bitwise_not(image_bw[inicio:fim]), inicio, fim, 1, 4)
+		for peca in pecas[primeira_peca:]:
+			if peca[0] == 0: peca[5] = oeste(rotulos, estatisticas, pecas_preto, inicio, *peca[3])
+		oestes = [None if inicial is None else oeste(rotulos, estatisticas, pecas_preto, inicio, *inicial) for inicial in iniciais]
+		return (divisa_branco, final_branco), (divisa_preto, final_preto), oestes
+
+	divisa_anterior = None
+	for inicio in range(0, altura, altura_faixa):
+		fim = min(altura, inicio + altura_faixa)
+		e0, e1 = limites(inicio)
+		contours, hierarchy = cv.findContours(image_bw[e0:e1], cv.RETR_TREE, cv.CHAIN_APPROX_SIMPLE, offset=(0, e0))
+
+		mantidos = []
+		if contours:
+			pai = hierarchy[0][:, 3]
+			# Buracos são os contornos em profundidade ímpar da árvore
+			profundidade = np.zeros(len(contours), np.int32); ancestral = pai.copy()
+			while (ancestral >= 0).any():
+				profundidade += ancestral >= 0
+				ancestral = np.where(ancestral >= 0, pai[np.maximum(ancestral, 0)], -1)
+			buraco = profundidade % 2 == 1
+			origem = np.array([contorno[0, 0] for contorno in contours])
+			topo = np.array([contorno[:, 0, 1].min() for contorno in contours])
+			base = np.array([contorno[:, 0, 1].max() for contorno in contours])
+			# Contornos que encostam na margem podem continuar fora dela
+			inteiros = ((topo > e0) | (e0 == 0)) & ((base < e1 - 1) | (e1 == altura))
+			mantidos = np.flatnonzero(inteiros & (origem[:, 1] >= inicio) & (origem[:, 1] < fim)).tolist()
+
+		# Peças das divisões da faixa e o que há à esquerda de cada borda externa mantida
+		iniciais = [None if buraco[i] else (int(origem[i, 1]), int(origem[i, 0])) for i in mantidos]
+		(divisa_branco, final_branco), (divisa_preto, final_preto), oestes = rotular_faixa(inicio, fim, len(pecas), iniciais)
+		externos += oestes
+
+		# Une as peças que se tocam na divisão com a faixa anterior
+		if divisa_anterior is not None:
+			anterior_branco, anterior_preto = divisa_anterior
+			pares = [np.stack([anterior_preto, divisa_preto], 1)[(anterior_preto >= 0) & (divisa_preto >= 0)]]
+			for d in (-1, 0, 1):
+				a = anterior_branco[max(0, -d):largura - max(0, d)]; b = divisa_branco[max(0, d):largura - max(0, -d)]
+				pares.append(np.stack([a, b], 1)[(a >= 0) & (b >= 0)])
+			for a, b in np.unique(np.concatenate(pares), axis=0).tolist():
+				ra, rb = raiz(a), raiz(b)
+				if ra != rb: pais[max(ra, rb)] = min(ra, rb)
+		divisa_anterior = (final_branco, final_preto)
+
+		if not mantidos: continue
+		tabelas.append(extrair_contornos([contours[i] for i in mantidos], hierarchy[:, mantidos]))
+		for i in mantidos:
+			# Os pontos identificam o contorno entre as faixas. Buracos e bordas externas podem ter os mesmos pontos
+			chaves.append((bool(buraco[i]), contours[i].tobytes()))
+			inicios.append((int(origem[i, 1]), int(origem[i, 0])))
+			chaves_pai.append((bool(buraco[pai[i]]), contours[pai[i]].tobytes()) if pai[i] >= 0 and inteiros[pai[i]] else None)
+
+	# Junta as peças de cada componente e segue a borda dos que não couberam inteiros em nenhuma faixa
+	componentes = {}
+	for i, peca in enumerate(pecas):
+		componente = componentes.setdefault(raiz(i), list(peca))
+		componente[1] = min(componente[1], peca[1]); componente[2] = max(componente[2], peca[2])
+		componente[4] = componente[4] or peca[4]
+		if peca[3] < componente[3]: componente[3], componente[5] = peca[3], peca[5]
+	seguidos = []
+	for cor, topo, base, (y, x), toca_moldura, oeste_primeiro in componentes.values():
+		if cor == 1:
+			# Fundo ligado à moldura não é buraco. O buraco começa no pixel branco à esquerda do seu primeiro pixel
+			if toca_moldura: continue
+			topo -= 1; base += 1; x -= 1
+		# O findContours descarta o ponto inicial quando ele está no meio de um trecho reto. A faixa dona do contorno
+		# é a do primeiro ponto gravado, a mesma usada para os contornos encontrados nas faixas
+		borda = seguir_borda(image_bw, x, y, cor == 1)
+		x, y = borda[0, 0].tolist()
+		e0, e1 = limites(y - y % altura_faixa)
+		if (topo > e0 or e0 == 0) and (base < e1 - 1 or e1 == altura): continue
+		seguidos.append(borda)
+		chaves.append((cor == 1, borda.tobytes())); chaves_pai.append(None); inicios.append((y, x))
+		externos.append(None if cor == 1 else oeste_primeiro)
+	tabelas.append(extrair_contornos(seguidos, np.full((1, len(seguidos), 4), -1, np.int32)))
+	contornos = np.concatenate(tabelas)
+
+	# Bordas externas com fundo ligado à moldura à esquerda estão no topo da árvore. O findContours lista primeiro
+	# a última delas na ordem de varredura: o contorno 0, cujos filhos nunca são buracos (ver classificar_contornos)
+	topo_arvore = [i for i, externo in enumerate(externos) if externo is True or \
+			(externo is not None and externo is not False and componentes[raiz(externo)][4])]
+	ordem = np.arange(len(contornos))
+	if topo_arvore:
+		zero = max(topo_arvore, key=lambda i: inicios[i])
+		ordem = np.concatenate([[zero], np.delete(ordem, zero)])
+	contornos = contornos[ordem]
+	posicao = {chaves[i]: nova for nova, i in enumerate(ordem.tolist())}
+	contornos['pai'] = [posicao.get(chaves_pai[i], -1) if chaves_pai[i] else -1 for i in ordem.tolist()]
+	return contornos
+
+
+def convert_bw(image_gs, blursize=3, blocksize=101, limiar=20, noise_verysmall=2, \
+		noise_small=4, noise_dist_min=50, char_radius_min=5, metricas=None, altura_faixa=0):
+	'''
+	Converte imagem GRAYSCALE para BINARY usando vários recursos de otimização,
+	como Threshold adaptativo e redução de ruídos
+
+	Args:
+		image_gs: Imagem em grayscale
+		blursize: Intensidade do desfoque inicial da imagem.
+		blocksize: Tamanho do bloco de analise do adaptiveThreshold.
+		limiar: Limite de brilho max para converter pixel para preto.
+		noise_verysmall: Contornos com raio até aqui são imediatamente descartados.
+		noise_small: Contornos isolados com até este raio sao descartados.
+		noise_dist_min: Distância mínima do centro de outros caracteres para um ruido ser considerado isolado.
+		char_radius_min: Raio mínimo para que um contorno seja considerado um caractere.
+		metricas: Dict onde são registrados os tempos de cada fase e as contagens de contornos (ver medir)
+		altura_faixa: Processa a imagem em faixas com esta qtd de linhas, limitando a memória ao tamanho de uma faixa
+			(ver binarizar_faixas e contornos_faixas). A imagem binária é a mesma. 0: imagem inteira
+	Returns:
+		NumPy Array: Imagem binária, já sem os ruídos (a mesma em modo debug e em produção)
+		NumPy Array: Registro de cada contorno e da sua classificação (MARCACAO_DTYPE), ver desenhar_marcacoes
+	'''
+	# encontra a maior raio possivel de um contorno valido
+	contour_maxsize = min(image_gs.shape[:2]) / 4
+
+	# Em faixas, nenhuma cópia da imagem inteira é feita além da própria imagem binária
+	faixas = 0 < altura_faixa < image_gs.shape[0]
+
+	with medir(metricas, 'convert_bw.threshold'):
+		if faixas:
+			image_bw = binarizar_faixas(image_gs, blursize, blocksize, limiar, altura_faixa)
+		else:
+			# Aplica um blur na imagem para suavizar o fundo
+			blurred = cv.GaussianBlur(image_gs, (blursize, blursize), 0)
+
+			# Binariza a imagem
+			image_bw = cv.adaptiveThreshold(blurred, 255, cv.ADAPTIVE_THRESH_MEAN_C, cv.THRESH_BINARY, blocksize, limiar)
+		print(f'Binarizando imagem: Blur={blursize} BlockSize={blocksize} Limiar={limiar}')
+
+	with medir(metricas, 'convert_bw.contornos'):
+		if faixas:
+			# Com margem maior que a altura do maior caractere, todo contorno que a classificação compara (caracteres
+			# e os seus buracos) cabe inteiro em alguma faixa, com o mesmo pai da imagem inteira
+			margem = 2 * max(noise_dist_min * 2, noise_small + 1, char_radius_min) + 8
+			contornos = contornos_faixas(image_bw, altura_faixa, margem)
+		else:
+			# Levanta os contornos externos da imagem
+			contours, hierarchy = cv.findContours(image_bw, cv.RETR_TREE, cv.CHAIN_APPROX_SIMPLE)
+
+			# Carrega as características de todos os contornos em uma única array NumPy estruturada
+			contornos = extrair_contornos(contours, hierarchy)
+
+	with medir(metricas, 'convert_bw.ruidos'):
+		# Classifica todos os contornos de uma só vez
+		noise, motivo, associado = classificar_contornos(contornos, noise_verysmall, noise_small, noise_dist_min, \
+				char_radius_min, (noise_dist_min*2))
+
+		# Apaga todos os contornos considerados ruido
+		apagar_ruidos(image_bw, contornos, noise)
+
+	# Registra quantos contornos foram encontrados e removidos, por motivo da classificação
+	contar(metricas, 'contornos', len(contornos))
+	contar(metricas, 'ruidos_removidos', int(noise.sum()))
+	for codigo, quantidade in enumerate(np.bincount(motivo, minlength=len(MOTIVOS)).tolist()):
+		contar(metricas, 'contornos_' + MOTIVOS[codigo], quantidade)
+
+	# Guarda somente o necessário para desenhar as marcações de debug quando (e onde) forem pedidas
+	marcacoes = np.empty(len(contornos), MARCACAO_DTYPE)
+	for campo in ('x', 'y', 'w', 'h', 'cx', 'cy', 'raio'):
+		marcacoes[campo] = contornos[campo]
+	marcacoes['ruido'] = noise; marcacoes['motivo'] = motivo; marcacoes['associado'] = associado
+
+	return image_bw, marcacoes
+
+
+def corrige_texto(texto, replacements):
+	"""
+	Pós processamento do texto extraído
+	Efetua correções dos erros mais comuns
+
+	A array replaces pode ter:
+		[regex, string] para substituicoes simples
+		[regex, regex] para substituicao usando back reference
+		[regex, lambda] para substituicao por funcoes que usam o backreference como parametro
+
+	Declarando flags dentro do proprio regex
+		(?i) Case Insensitive
+		(?m) Multiline. Permite que ^ e $ correspondam ao início e ao fim de cada linha
+		(?s): Faz com que o ponto (.) corresponda a qualquer caractere, incluindo novas linhas.
+		sintaxe para 2 flags: r'(?i)(?m)restantedaregex'
+
+	Para muitas páginas, prefira compilar as regras uma vez com compilar_correcoes
+
+	Args:
+		texto: String com o texto extraído das imagens
+		replacements: lista de tuples com os patterns (regex) e seus replacements
+
+	Returns:
+		String: texto com as substituições aplicadas
+	"""
+	return compilar_correcoes(replacements)(texto)
+
+
+def corrigir_arquivo(arquivo_entrada, arquivo_saida, corrigir, separador='\n\n\n\n\n\n', bloco=1 << 20):
+	'''
+	Aplica as correções a um arquivo de texto página a página, sem carregá-lo inteiro na memória.
+	As páginas são identificadas pelo separador que antecede o nome de cada imagem no texto extraído,
+	de modo que o resultado é o mesmo da correção feita página a página no modo streaming
+
+	Args:
+		arquivo_entrada: Arquivo com o texto bruto
+		arquivo_saida: Arquivo onde o texto corrigido é gravado
+		corrigir: Função criada por compilar_correcoes
+		separador: Texto que inicia cada página
+		bloco: Qtd de caracteres lidos de cada vez
+	'''
+	with open(arquivo_entrada, 'r') as entrada, open(arquivo_saida, 'w') as saida:
+		pendente = ''
+		while True:
+			lido = entrada.read(bloco)
+			pendente += lido
+			# Corrige todas as páginas completas do buffer. A última pode continuar no próximo bloco
+			inicio = 0
+			fim = pendente.find(separador, 1)
+			while fim > 0:
+				saida.write(corrigir(pendente[inicio:fim]))
+				inicio = fim
+				fim = pendente.find(separador, inicio + 1)
+			pendente = pendente[inicio:]
+			if not lido:
+				break
+		if pendente:
+			saida.write(corrigir(pendente))
+
+
+def corrigir_paginas(conexao, corrigir, lote=100, execucao=None):
+	'''
+	Aplica as correções ao texto de cada página do arquivo de páginas (ver abrir_paginas), um lote por vez
+
+	Args:
+		conexao: Conexão retornada por abrir_paginas
+		corrigir: Função retornada por compilar_correcoes
+		lote: Qtd de páginas lidas e gravadas por transação
+		execucao: Somente as páginas gravadas por esta execução. None corrige todas
+	'''
+	ultimo = ''
+	filtro, argumentos = ('', ()) if execucao is None else ('AND execucao = ? ', (execucao,))
+	while True:
+		paginas = conexao.execute(f'SELECT nome, texto FROM paginas WHERE nome > ? {filtro}ORDER BY nome LIMIT ?', \
+				(ultimo,) + argumentos + (lote,)).fetchall()
+		if not paginas: break
+		with conexao:
+			conexao.executemany('UPDATE paginas SET texto_corrigido = ? WHERE nome = ?', \
+					[(corrigir(texto), nome) for nome, texto in paginas])
+		ultimo = paginas[-1][0]
+
+
+def criar_ocr(backend='auto', tesseract_config='', cache=None, confianca=False, regioes=1, palavras=False, duplicatas=None):
+	'''
+	Cria a função de OCR usada na extração do texto
+
+	Backends:
+		tesserocr: Mantém um motor do Tesseract carregado por thread (bindings da API C).
+			A imagem é entregue direto da memória, sem arquivo temporário e sem recarregar os idiomas
+		pytesseract: Executa o binário do tesseract a cada página (comportamento original)
+		auto: tesserocr quando instalado, senão pytesseract
+
+	Args:
+		backend: 'auto', 'tesserocr' ou 'pytesseract'
+		tesseract_config: Parâmetros no formato da linha de comando do tesseract. Ex: '--psm 6 -l por'
+		cache: Dict {'pasta', 'tamanho_max'}. O texto é reaproveitado quando a mesma imagem já passou pelo
+			OCR com a mesma configuração. None desliga o cache
+		confianca: Retorna também a confiança (0 a 100) de cada palavra reconhecida. Não usa o cache
+		regioes: Divide cada página em até N regiões de linhas inteiras (ver segmentar_regioes), reconhecidas
+			em paralelo e unidas na ordem de leitura. Sem --psm em tesseract_config, as regiões usam --psm 6
+		palavras: Retorna também cada palavra reconhecida, com a sua confiança e posição na página
+			(ver interpretar_tsv), obtidas no mesmo reconhecimento do texto
+		duplicatas: Dict {'arquivo', 'distancia'}. Uma página cuja assinatura (ver assinatura_imagem) esteja a até
+			'distancia' bits de uma página já reconhecida é considerada outra foto da mesma folha e reaproveita
+			o seu resultado, sem passar pelo Tesseract. None desliga a detecção. Não vale com confianca
+
+	Returns:
+		Function: Recebe a imagem binarizada (caminho ou NumPy Array) e, opcionalmente, o dict de métricas
+			da página (ver medir). Retorna o texto extraído, a tuple (texto, confianças) quando confianca
+			ou a tuple (texto, palavras) quando palavras
+		String: Nome do backend efetivamente utilizado
+	'''
+	if backend not in ('auto', 'tesserocr', 'pytesseract'):
+		raise ValueError(f'Backend de OCR desconhecido: {backend}')
+
+	# Cada região é um bloco uniforme de linhas, sem a análise de layout da página inteira
+	if regioes > 1 and '--psm' not in tesseract_config:
+		tesseract_config = (tesseract_config + ' --psm 6').strip()
+
+	if backend in ('auto', 'tesserocr'):
+		try:
+			import tesserocr
+			backend = 'tesserocr'
+		except ImportError:
+			if backend == 'tesserocr': raise
+			backend = 'pytesseract'
+
+	if backend == 'pytesseract':
+		import pytesseract
+		from PIL import Image
+
+		def reconhecer(image_bw):
+			# Converte a imagem para o formato compreendido pelo Tesseract
+			# indica que é imagem binária (versões recentes do Pillow não permitem alterar o mode diretamente)
+			imagem_pil = Image.fromarray(image_bw).convert('1', dither=Image.Dither.NONE)
+			if confianca:
+				# Remonta o texto a partir das palavras, uma linha por vez, junto com a confiança de cada palavra
+				dados = pytesseract.image_to_data(imagem_pil, config=tesseract_config, output_type=pytesseract.Output.DICT)
+				linhas, confiancas = {}, []
+				for i, palavra in enumerate(dados['text']):
+					if not palavra.strip() or float(dados['conf'][i]) < 0: continue
+					linhas.setdefault((dados['block_num'][i], dados['par_num'][i], dados['line_num'][i]), []).append(palavra)
+					confiancas.append(float(dados['conf'][i]))
+				return '\n'.join(' '.join(palavras) for palavras in linhas.values()), confiancas
+			if palavras:
+				# O texto e as palavras saem de uma única execução do tesseract
+				texto, tsv = pytesseract.run_and_get_multiple_output(imagem_pil, extensions=['txt', 'tsv'], config=tesseract_config)
+				return texto, interpretar_tsv(tsv)
+			if (tesseract_config):
+				return pytesseract.image_to_string(imagem_pil, config=tesseract_config)
+			return pytesseract.image_to_string(imagem_pil)
+	else:
+		import threading
+		opcoes = interpretar_tesseract_config(tesseract_config)
+		locais = threading.local()
+
+		def reconhecer(image_bw):
+			# Cada thread inicializa seu próprio motor uma única vez e o reutiliza nas páginas seguintes
+			api = getattr(locais, 'api', None)
+			if api is None:
+				argumentos = {'lang': opcoes['lang'], 'psm': opcoes['psm'], 'oem': opcoes['oem']}
+				if opcoes['tessdata']: argumentos['path'] = opcoes['tessdata']
+				api = tesserocr.PyTessBaseAPI(**argumentos)
+				for nome, valor in opcoes['variaveis'].items():
+					api.SetVariable(nome, valor)
+				locais.api = api
+			image_bw = np.ascontiguousarray(image_bw)
+			altura, largura = image_bw.shape[:2]
+			api.SetImageBytes(image_bw.tobytes(), largura, altura, 1, largura)
+			if confianca:
+				return api.GetUTF8Text(), [float(valor) for valor in api.AllWordConfidences()]
+			if palavras:
+				return api.GetUTF8Text(), interpretar_tsv(api.GetTSVText(0))
+			return api.GetUTF8Text()
+
+	if regioes > 1:
+		# As regiões de uma página são reconhecidas em threads próprias, separadas das threads de páginas,
+		# para que uma página nunca espere por uma vaga ocupada por outra página
+		from concurrent.futures import ThreadPoolExecutor
+		pool_regioes = ThreadPoolExecutor(max_workers=regioes)
+		reconhecer_regiao = reconhecer
+
+		def reconhecer(image_bw):
+			colunas = segmentar_regioes(image_bw, regioes)
+			caixas = [caixa for coluna in colunas for caixa in coluna]
+			resultados = list(pool_regioes.map(lambda caixa: reconhecer_regiao(image_bw[caixa[1]:caixa[3], caixa[0]:caixa[2]]), caixas))
+			textos = [resultado[0] if confianca or palavras else resultado for resultado in resultados]
+			# Junta as regiões na ordem de leitura: linhas de uma coluna em sequência e uma linha em branco entre colunas
+			posicao, blocos = 0, []
+			for coluna in colunas:
+				blocos.append('\n'.join(texto.strip() for texto in textos[posicao:posicao + len(coluna)] if texto.strip()))
+				posicao += len(coluna)
+			texto = '\n\n'.join(bloco for bloco in blocos if bloco) + '\n'
+			if confianca:
+				return texto, [valor for resultado in resultados for valor in resultado[1]]
+			if palavras:
+				# As posições passam a ser relativas à página, e não à região
+				return texto, [[palavra, conf, x + caixa[0], y + caixa[1], w, h] \
+						for caixa, resultado in zip(caixas, resultados) for palavra, conf, x, y, w, h in resultado[1]]
+			return texto
+
+	# Páginas só são comparadas com as reconhecidas pela mesma configuração, que geraria o mesmo resultado
+	configuracao_duplicatas = chave_cache('duplicatas', backend, tesseract_config, regioes, palavras)
+
+	def ocr(imagem, metricas=None):
+		with medir(metricas, 'ocr'):
+			image_bw = carregar_imagem_bw(imagem)
+			if cache and not confianca:
+				# A chave usa os pixels da imagem, e não o arquivo, para valer tanto para o PNG quanto para a imagem em memória
+				chave = chave_cache('ocr', hash_imagem(image_bw), backend, tesseract_config, regioes, palavras)
+				texto = ler_cache(cache, chave)
+				if texto is not None:
+					contar(metricas, 'cache_ocr', 1)
+					return tuple(json.loads(texto)) if palavras else texto.decode('utf-8')
+			assinatura = None
+			if duplicatas and not confianca:
+				assinatura = assinatura_imagem(image_bw)
+				resultado = buscar_duplicata(duplicatas, configuracao_duplicatas, assinatura)
+				if resultado is not None:
+					contar(metricas, 'duplicatas', 1)
+					return tuple(json.loads(resultado)) if palavras else resultado
+			texto = reconhecer(image_bw)
+			if cache and not confianca:
+				gravar_cache(cache, chave, 'ocr', (json.dumps(texto) if palavras else texto).encode('utf-8'))
+			if assinatura is not None:
+				registrar_duplicata(duplicatas, configuracao_duplicatas, assinatura, json.dumps(texto) if palavras else texto)
+			return texto
+	return ocr, backend
+
+
+def criar_pasta(path):
+	'''
+	Cria uma pasta, caso ela ainda não exista.
+
+	Args:
+		path: Caminho completo da pasta
+	'''
+
+	if not os.path.exists(path):
+		os.makedirs(path)
+		print(f'A pasta {path} foi criada com sucesso.')
+	else:
+		print(f'A pasta {path} já existe.')
+	return None
+
+
+def desenhar_marcacoes(image, marcacoes, escala=1.0, janela=None):
+	'''
+	Desenha as marcações da remoção de ruídos (ver convert_bw) somente quando são pedidas e somente no trecho visível:
+	a imagem é recortada e reduzida antes, e só os contornos dentro da janela são desenhados
+
+	Marcações:
+		VERMELHO: círculo em cada ruído removido, com o seu raio e ID
+		AZUL: retângulo em cada contorno mantido, com o seu raio
+		VERDE: linha ligando um ponto próximo (ex: pingo do i) ao seu caractere
+
+	Args:
+		image: Imagem em grayscale ou BGR, na resolução em que os contornos foram encontrados
+		marcacoes: Array estruturada (MARCACAO_DTYPE) retornada por convert_bw
+		escala: Fator de redução da imagem e das marcações (ver escala_tela). Os textos só são desenhados a partir de 0.5
+		janela: Tuple (x0, y0, x1, y1) com o trecho a ser desenhado, na resolução original. None desenha a imagem inteira
+
+	Returns:
+		NumPy Array: Imagem BGR com as marcações
+	'''
+	RED=(0,0,255); GREEN=(0,255,0); BLUE=(255,0,0); MARKRADIUS=30
+	altura, largura = image.shape[:2]
+	x0, y0, x1, y1 = janela or (0, 0, largura, altura)
+	x0, y0, x1, y1 = max(0, x0), max(0, y0), min(largura, x1), min(altura, y1)
+
+	trecho = image[y0:y1, x0:x1]
+	if escala != 1.0:
+		trecho = cv.resize(trecho, (max(1, round((x1 - x0) * escala)), max(1, round((y1 - y0) * escala))), interpolation=cv.INTER_AREA)
+	image_debug = cv.cvtColor(trecho, cv.COLOR_GRAY2BGR) if trecho.ndim == 2 else trecho.copy()
+
+	def ponto(x, y):
+		return (round((x - x0) * escala), round((y - y0) * escala))
+
+	# Contornos cuja marcação (retângulo, círculo ou texto) alcança a janela
+	visiveis = np.flatnonzero((marcacoes['x'] + marcacoes['w'] + MARKRADIUS >= x0) & (marcacoes['x'] - MARKRADIUS < x1) \
+			& (marcacoes['y'] + marcacoes['h'] + MARKRADIUS >= y0) & (marcacoes['y'] - MARKRADIUS < y1))
+	textos = escala >= 0.5
+	for i in visiveis.tolist():
+		x, y, w, h, cx, cy, raio, ruido, motivo, associado = marcacoes[i].tolist()
+		if ruido:
+			cv.circle(image_debug, ponto(cx, cy), max(1, round(MARKRADIUS * escala)), RED, 1) # marca o ruido detectado
+			if textos: imprimir_texto(image_debug, ('r:'+str(raio)+' '+'i:'+str(i)), ponto(cx, cy), RED)
+		else:
+			# Contornos que NÃO foram considerados ruído
+			cv.rectangle(image_debug, ponto(x, y), ponto(x+w, y+h), BLUE, 1)
+			if textos: imprimir_texto(image_debug, ('r:'+str(raio)), ponto(x, y-2), BLUE)
+			if MOTIVOS[motivo] == 'close':
+				cv.line(image_debug, ponto(cx, cy), ponto(int(marcacoes['cx'][associado]), int(marcacoes['cy'][associado])), GREEN, 2)
+	return image_debug
+
+
+def escala_tela(image):
+	'''
+	Calcula a redução necessária para que uma imagem caiba na tela (ver resize_to_screen)
+
+	Args:
+		image: Array NumPy contendo a imagem
+
+	Returns:
+		Float: Proporção de redimensionamento, ou 1.0 quando a imagem já cabe na tela
+	'''
+	# Manter 10% de área livre na tela
+	ESPACO_LIVRE = 0.1
+
+	# Define o resolução do monitor
+	largura_tela, altura_tela = get_screen_resolution_linux()
+	altura_imagem, largura_imagem = image.shape[:2]
+
+	if largura_imagem <= largura_tela and altura_imagem <= altura_tela:
+		return 1.0
+
+	# Calcular a proporção de redimensionamento da imagem
+	proporcao_largura = largura_tela * (1.0 - ESPACO_LIVRE) / largura_imagem
+	proporcao_altura = altura_tela * (1.0 - ESPACO_LIVRE) / altura_imagem
+	return min(proporcao_largura, proporcao_altura)
+
+
+def executar_servico(pasta_entrada, pasta_saida, parametros, corrigir, processos=1, threads_opencv=1, backend='auto', \
+		tesseract_config='', regioes=1, cache=None, sufixo_bw=None, intervalo=2, extensoes=EXTENSOES_IMAGENS, \
+		duplicatas=None):
+	'''
+	Modo serviço: vigia a pasta de entrada e processa cada foto nova assim que ela termina de ser copiada,
+	sem precisar reiniciar o script. Executa até ser interrompido (Ctrl+C)
+
+	As fotos entram em uma fila limitada (2 x processos). Quando a fila enche, a varredura espera os workers,
+	em vez de acumular caminhos na memória. O texto corrigido de cada foto é gravado em pasta_saida/textos,
+	de forma atômica, assim que fica pronto. Fotos que já têm o texto (ou o registro de falha) mais novo que
+	a própria foto são ignoradas, inclusive depois de reiniciar o serviço
+
+	Uma falha em uma foto não encerra o serviço: o erro é gravado em pasta_saida/textos/<foto>.erro. Quando um
+	processo do pool morre (ex: encerrado por falta de memória), o pool é recriado e cada foto que estava em andamento
+	é repetida sozinha no pool. Só a foto que derruba o processo mesmo sozinha é registrada como falha
+
+	Args:
+		pasta_entrada: Pasta vigiada
+		pasta_saida: Pasta dos resultados
+		parametros: Dict com os parâmetros de configuração do tratamento
+		corrigir: Função de correção criada por compilar_correcoes
+		processos: Qtd de fotos processadas em paralelo (tratamento e OCR no mesmo processo)
+		threads_opencv: Threads internas do OpenCV em cada processo
+		backend: Backend de OCR (ver criar_ocr)
+		tesseract_config: Parâmetros no formato da linha de comando do tesseract
+		regioes: Qtd máxima de regiões de cada página reconhecidas em paralelo (ver criar_ocr)
+		cache: Dict {'pasta', 'tamanho_max'} do cache de resultados, ou None
+		sufixo_bw: Grava também a imagem binarizada de cada foto em pasta_saida, com este sufixo ('_BW.png' ou
+			'_BW.npy', ver codificar_imagem_bw). None não grava
+		intervalo: Segundos entre as varreduras da pasta
+		extensoes: Extensões das fotos vigiadas, sem diferenciar maiúsculas de minúsculas (ver listar_imagens)
+		duplicatas: Dict {'arquivo', 'distancia'} do índice de duplicatas (ver criar_ocr), ou None
+	'''
+	import asyncio
+	from concurrent.futures import ProcessPoolExecutor
+	from concurrent.futures.process import BrokenProcessPool
+
+	pasta_textos = os.path.join(pasta_saida, 'textos')
+	os.makedirs(pasta_textos, exist_ok=True)
+	extensoes = tuple(extensao.lower() for extensao in extensoes)
+
+	def resultado(caminho, extensao):
+		return os.path.join(pasta_textos, os.path.splitext(os.path.basename(caminho))[0] + extensao)
+
+	def processada(caminho, modificacao):
+		# O texto ou o registro da falha precisam ser mais novos que a foto
+		for extensao in ('.txt', '.erro'):
+			try:
+				if os.stat(resultado(caminho, extensao)).st_mtime >= modificacao:
+					return True
+			except FileNotFoundError:
+				pass
+		return False
+
+	def criar_pool():
+		return ProcessPoolExecutor(max_workers=processos, initializer=inicializar_processo_servico, \
+				initargs=(threads_opencv, backend, tesseract_config, cache, regioes, duplicatas))
+
+	async def servico():
+		loop = asyncio.get_running_loop()
+		fila = asyncio.Queue(maxsize=2 * processos)
+		em_andamento, concluidas, tamanhos = set(), {}, {}
+		# Fotos no pool e fotos que esperam (ou estão) rodando sozinhas, depois de um processo morrer
+		ocupacao = {'fotos': 0, 'sozinhas': 0}
+		condicao = asyncio.Condition()
+
+		async def processar(argumentos, sozinha):
+			async with condicao:
+				if sozinha: ocupacao['sozinhas'] += 1
+				# Uma foto sozinha espera o pool esvaziar, e nenhuma outra entra enquanto ela espera ou roda
+				await condicao.wait_for(lambda: ocupacao['fotos'] == 0 if sozinha else ocupacao['sozinhas'] == 0)
+				ocupacao['fotos'] += 1
+			executor = pool[0]
+			try:
+				return await loop.run_in_executor(executor, processar_pagina_servico, argumentos)
+			except BrokenProcessPool:
+				# Todas as fotos em andamento no pool quebrado recebem este erro. Só a primeira recria o pool
+				if pool[0] is executor:
+					executor.shutdown(wait=False)
+					pool[0] = criar_pool()
+				raise
+			finally:
+				async with condicao:
+					ocupacao['fotos'] -= 1
+					if sozinha: ocupacao['sozinhas'] -= 1
+					condicao.notify_all()
+
+		async def vigiar():
+			while True:
+				for entrada in sorted(os.scandir(pasta_entrada), key=lambda entrada: entrada.name):
+					if not entrada.is_file() or not entrada.name.lower().endswith(extensoes) or entrada.path in em_andamento:
+						continue
+					estado = entrada.stat()
+					assinatura = (estado.st_size, estado.st_mtime)
+					if concluidas.get(entrada.path) == assinatura:
+						continue
+					if processada(entrada.path, estado.st_mtime):
+						concluidas[entrada.path] = assinatura
+						continue
+					# A foto só entra na fila quando o tamanho para de mudar entre duas varreduras (cópia concluída)
+					if tamanhos.get(entrada.path) != assinatura:
+						tamanhos[entrada.path] = assinatura
+						continue
+					del tamanhos[entrada.path]
+					em_andamento.add(entrada.path)
+					await fila.put((entrada.path, assinatura))
+				await asyncio.sleep(intervalo)
+
+		async def trabalhar():
+			while True:
+				caminho, assinatura = await fila.get()
+				saida_bw = None
+				if sufixo_bw:
+					saida_bw = os.path.join(pasta_saida, re.sub(r'(?i)\.[^.]+$', sufixo_bw, os.path.basename(caminho)))
+				try:
+					argumentos = (caminho, saida_bw, parametros, cache)
+					try:
+						_, texto, erro = await processar(argumentos, False)
+					except BrokenProcessPool:
+						print(f'Processo encerrado durante: {caminho}. Repetindo a foto sozinha')
+						try:
+							_, texto, erro = await processar(argumentos, True)
+						except BrokenProcessPool:
+							texto, erro = None, 'BrokenProcessPool: o processo foi encerrado durante esta foto (falta de memória?)'
+					if erro:
+						print(f'FALHA NO TRATAMENTO DA IMAGEM: {caminho} ({erro})')
+						gravar_arquivo_atomico(resultado(caminho, '.erro'), erro)
+					else:
+						gravar_arquivo_atomico(resultado(caminho, '.txt'), corrigir(texto))
+						print(f'Concluída: {caminho}')
+				except Exception as excecao:
+					# Falha na correção ou na gravação do texto: registra e segue para a próxima foto
+					erro = f'{type(excecao).__name__}: {excecao}'
+					print(f'FALHA NO PROCESSAMENTO DA IMAGEM: {caminho} ({erro})')
+					try:
+						gravar_arquivo_atomico(resultado(caminho, '.erro'), erro)
+					except OSError as excecao:
+						print(f'Não foi possível gravar o registro da falha: {caminho} ({excecao})')
+				finally:
+					concluidas[caminho] = assinatura
+					em_andamento.discard(caminho)
+					fila.task_done()
+
+		# Lista com o pool atual, recriado pelos workers quando um processo morre
+		pool = [criar_pool()]
+		try:
+			await asyncio.gather(vigiar(), *(trabalhar() for _ in range(processos)))
+		finally:
+			pool[0].shutdown(cancel_futures=True)
+
+	print(f'Serviço iniciado. Vigiando {pasta_entrada} com {processos} processos (Ctrl+C para encerrar)')
+	try:
+		asyncio.run(servico())
+	except KeyboardInterrupt:
+		print('Serviço encerrado')
+
+
+def exportar_texto(conexao, arquivo, coluna='texto', execucao=None):
+	'''
+	Gera o arquivo texto com as páginas do arquivo de páginas (ver abrir_paginas), no mesmo formato do texto
+	extraído: quebras de linha, nome da imagem e o texto de cada página
+
+	Args:
+		conexao: Conexão retornada por abrir_paginas
+		arquivo: Caminho do arquivo texto
+		coluna: 'texto' ou 'texto_corrigido'
+		execucao: Somente as páginas gravadas por esta execução (ver armazenar_textos), na ordem em que foram
+			gravadas. None exporta todas as páginas do arquivo, em ordem alfabética
+	'''
+	if coluna not in ('texto', 'texto_corrigido'):
+		raise ValueError(f'Coluna desconhecida: {coluna}')
+	if execucao is None:
+		consulta = conexao.execute(f'SELECT nome, {coluna} FROM paginas ORDER BY nome')
+	else:
+		# INSERT OR REPLACE dá um rowid novo à página regravada, então o rowid segue a ordem da gravação
+		consulta = conexao.execute(f'SELECT nome, {coluna} FROM paginas WHERE execucao = ? ORDER BY rowid', (execucao,))
+	with open(arquivo, 'w') as file:
+		for nome, texto in consulta:
+			file.write('\n\n\n\n\n\n' + nome + '\n\n' + (texto or ''))
+
+
+def extrair_contornos(contours, hierarchy):
+	'''
+	Carrega as características de cada contorno (retângulo e círculo que o contém, e contorno pai)
+	em uma array NumPy estruturada (CONTORNO_DTYPE), sem manter os poligonos na memória
+	Ref: https://docs.opencv.org/3.4/da/d0c/tutorial_bounding_rects_circles.html
+
+	Args:
+		contours: Contornos retornados por cv.findContours
+		hierarchy: Hierarquia retornada por cv.findContours (RETR_TREE)
+
+	Returns:
+		NumPy Array: Uma linha por contorno com os campos x, y, w, h, cx, cy, raio e pai
+	'''
+	contornos = np.zeros(len(contours), dtype=CONTORNO_DTYPE)
+	if not len(contours):
+		return contornos
+
+	# O OpenCV não tem versão em lote do approxPolyDP / minEnclosingCircle, então cada contorno
+	# passa por um laço enxuto que grava os valores brutos direto em arrays pré-alocadas
+	retangulos = np.empty((len(contours), 4), dtype=np.int32)
+	circulos = np.empty((len(contours), 3), dtype=np.float64)
+	for i, contourn in enumerate(contours):
+		poly = cv.approxPolyDP(contourn, 3, True)
+		retangulos[i] = cv.boundingRect(poly)
+		(circulos[i, 0], circulos[i, 1]), circulos[i, 2] = cv.minEnclosingCircle(poly)
+
+	# np.rint arredonda como o round() do Python (metade para o par)
+	circulos = np.rint(circulos).astype(np.int32)
+	contornos['x'], contornos['y'], contornos['w'], contornos['h'] = retangulos.T
+	contornos['cx'], contornos['cy'], contornos['raio'] = circulos.T
+	contornos['pai'] = hierarchy[0][:, 3]
+	return contornos
+
+
+def extrair_texto_processo(pagina):
+	'''
+	Extrai o texto de uma página dentro de um processo do pool de OCR (ver inicializar_processo_ocr)
+
+	Args:
+		pagina: Tuple (nome, imagem, medir_etapas). A imagem pode ser o caminho do arquivo ou o NumPy Array
+
+	Returns:
+		Tuple: (nome, texto extraído, métricas da página ou None)
+	'''
+	nome, imagem, medir_etapas = pagina
+	metricas = {} if medir_etapas else None
+	return nome, OCR_PROCESSO(imagem, metricas), metricas
+
+
+def extrair_textos(paginas, backend='auto', tesseract_config='', workers=1, paralelismo='thread', omp_thread_limit=0, \
+		cache=None, metricas=None, regioes=1, palavras=False, duplicatas=None):
+	'''
+	Extrai o texto de uma sequência de páginas binarizadas, opcionalmente em paralelo.
+	As páginas são consumidas sob demanda, com no máximo 2 x workers páginas em memória
+
+	Args:
+		paginas: Iterável de tuples (nome, imagem). A imagem pode ser o caminho do arquivo ou o NumPy Array
+		backend: Backend de OCR (ver criar_ocr)
+		tesseract_config: Parâmetros no formato da linha de comando do tesseract
+		workers: Qtd de páginas processadas em paralelo
+		paralelismo: 'thread' ou 'process'
+		omp_thread_limit: Threads OpenMP de cada motor. 0 limita a 1 quando houver mais de um worker ou de uma região,
+			a menos que OMP_THREAD_LIMIT já esteja definido no ambiente
+		cache: Dict {'pasta', 'tamanho_max'}. Reaproveita o texto de páginas com o mesmo conteúdo e a mesma
+			configuração do Tesseract. None desliga o cache
+		metricas: Dict {nome: métricas da página}. As métricas do OCR de cada página são registradas
+			em metricas[nome] (ver medir). None não registra
+		regioes: Qtd máxima de regiões de cada página reconhecidas em paralelo (ver criar_ocr)
+		palavras: Retorna, no lugar do texto, a tuple (texto, palavras) de cada página (ver criar_ocr)
+		duplicatas: Dict {'arquivo', 'distancia'}. Reaproveita o texto de outras fotos da mesma folha (ver criar_ocr).
+			None desliga a detecção
+
+	Yields:
+		Tuple: (nome, texto), na mesma ordem da entrada
+	'''
+	if paralelismo not in ('thread', 'process'):
+		raise ValueError(f'Paralelismo desconhecido: {paralelismo}')
+
+	# O Tesseract usa OpenMP internamente. Com vários workers, cada motor deve usar uma única thread
+	# para não disputar os núcleos. Precisa ser definido antes do motor ser carregado
+	if omp_thread_limit:
+		os.environ['OMP_THREAD_LIMIT'] = str(omp_thread_limit)
+	elif workers > 1 or regioes > 1:
+		os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+	def anunciar(paginas):
+		for nome, imagem in paginas:
+			print(f"INICIO EXTRACAO_TEXTO: {nome}")
+			yield nome, imagem
+
+	def metricas_pagina(nome):
+		return None if metricas is None else metricas.setdefault(nome, {})
+
+	if workers <= 1:
+		ocr, backend = criar_ocr(backend, tesseract_config, cache, regioes=regioes, palavras=palavras, duplicatas=duplicatas)
+		print(f'OCR: backend {backend}')
+		for nome, imagem in anunciar(paginas):
+			yield nome, ocr(imagem, metricas_pagina(nome))
+		return
+
+	if paralelismo == 'thread':
+		# tesserocr e o subprocesso do pytesseract liberam o GIL durante o reconhecimento
+		from concurrent.futures import ThreadPoolExecutor
+		ocr, backend = criar_ocr(backend, tesseract_config, cache, regioes=regioes, palavras=palavras, duplicatas=duplicatas)
+		print(f'OCR: backend {backend}, {workers} threads')
+		with ThreadPoolExecutor(max_workers=workers) as pool:
+			yield from mapear_em_ordem(pool, lambda pagina: (pagina[0], ocr(pagina[1], metricas_pagina(pagina[0]))), \
+					anunciar(paginas), 2 * workers)
+	else:
+		from concurrent.futures import ProcessPoolExecutor
+		print(f'OCR: backend {backend}, {workers} processos')
+		# As métricas são registradas no processo do OCR e devolvidas junto com o texto
+		paginas = ((nome, imagem, metricas is not None) for nome, imagem in anunciar(paginas))
+		with ProcessPoolExecutor(max_workers=workers, initializer=inicializar_processo_ocr, \
+				initargs=(backend, tesseract_config, cache, regioes, palavras, duplicatas)) as pool:
+			for nome, texto, metricas_processo in mapear_em_ordem(pool, extrair_texto_processo, paginas, 2 * workers):
+				if metricas_processo:
+					registro = metricas_pagina(nome)
+					for grupo, valores in metricas_processo.items():
+						registro.setdefault(grupo, {}).update(valores)
+				yield nome, texto
+
+
+def get_screen_resolution_linux():
+	'''
+	Retorna a resolução do monitor
+
+	Returns:
+		Int: Largura
+		Int: Altura
+	'''
+	output = subprocess.check_output(['xrandr']).decode('utf-8')
+	for line in output.splitlines():
+		if ' current' in line:
+			dim = re.findall(r'current (\d+) x (\d+)', line)
+			largura = 1920; altura=1080
+			if (dim):
+				largura = dim[0][0];altura = dim[0][1]
+			break
+	return int(largura), int(altura)
+
+
+def gravar_arquivo_atomico(arquivo, conteudo):
+	'''
+	Grava um arquivo em uma cópia temporária e a renomeia, para que quem o leia nunca encontre um arquivo incompleto
+
+	Args:
+		arquivo: Caminho do arquivo
+		conteudo: String ou bytes
+	'''
+	temporario = f'{arquivo}.{os.getpid()}.tmp'
+	with open(temporario, 'wb' if isinstance(conteudo, bytes) else 'w') as file:
+		file.write(conteudo)
+	os.replace(temporario, arquivo)
+
+
+def gravar_cache(cache, chave, etapa, dados):
+	'''
+	Grava um resultado no cache e remove os mais antigos (menos acessados) caso o tamanho máximo seja ultrapassado
+
+	Args:
+		cache: Dict {'pasta', 'tamanho_max'} ou None (cache desligado)
+		chave: Chave gerada por chave_cache
+		etapa: Nome da etapa, apenas informativo
+		dados: Bytes a serem gravados
+	'''
+	if not cache: return
+	conexao = abrir_cache(cache)
+
+	# Grava em um arquivo temporário e renomeia, para que outro processo nunca leia um arquivo incompleto
+	arquivo = os.path.join(cache['pasta'], chave[:2], chave)
+	os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+	temporario = f'{arquivo}.{os.getpid()}.tmp'
+	with open(temporario, 'wb') as file:
+		file.write(dados)
+	os.replace(temporario, arquivo)
+	conexao.execute('INSERT OR REPLACE INTO entradas VALUES (?, ?, ?, ?)', (chave, etapa, len(dados), time.time()))
+
+	# Remove os resultados acessados há mais tempo até liberar 10% do tamanho máximo
+	total = conexao.execute('SELECT COALESCE(SUM(tamanho), 0) FROM entradas').fetchone()[0]
+	if total > cache['tamanho_max']:
+		for chave_antiga, tamanho in conexao.execute('SELECT chave, tamanho FROM entradas ORDER BY acesso').fetchall():
+			if total <= cache['tamanho_max'] * 0.9: break
+			conexao.execute('DELETE FROM entradas WHERE chave = ?', (chave_antiga,))
+			try: os.remove(os.path.join(cache['pasta'], chave_antiga[:2], chave_antiga))
+			except FileNotFoundError: pass
+			total -= tamanho
+
+
+def gravar_paginas(conexao, paginas):
+	'''
+	Grava um lote de páginas no arquivo de páginas (ver abrir_paginas) em uma única transação.
+	Uma página já existente é substituída, então reprocessar uma página não exige regravar as demais
+
+	Args:
+		conexao: Conexão retornada por abrir_paginas
+		paginas: Lista de dicts {'nome', 'texto', 'texto_corrigido' (ou None), 'palavras' (ver interpretar_tsv),
+			'metricas' (ver medir, ou None), 'hash_parametros', 'execucao' (opcional)}
+	'''
+	registros = []
+	for pagina in paginas:
+		confiancas = [palavra[1] for palavra in pagina['palavras']]
+		registros.append((pagina['nome'], pagina['texto'], pagina['texto_corrigido'], \
+				sum(confiancas) / len(confiancas) if confiancas else None, json.dumps(pagina['palavras'], ensure_ascii=False), \
+				json.dumps(pagina['metricas']) if pagina['metricas'] else None, pagina['hash_parametros'], time.time(), \
+				pagina.get('execucao')))
+	with conexao:
+		conexao.executemany('INSERT OR REPLACE INTO paginas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', registros)
+
+
+def gravar_parametros(arquivo, parametros, pontuacao, amostra):
+	'''
+	Grava os parâmetros calibrados no formato do parametros.py, pronto para ser copiado para a pasta do script
+
+	Args:
+		arquivo: Caminho do arquivo a ser gravado
+		parametros: Dict com os parâmetros (mesmos nomes das configurações)
+		pontuacao: Pontuação obtida na calibração
+		amostra: Fotos usadas na calibração
+	'''
+	with open(arquivo, 'w') as file:
+		file.write(f"# Gerado pela calibração automática em {time.strftime('%Y-%m-%d %H:%M')}. Pontuação: {pontuacao:.2f}\n")
+		file.write(f"# Amostra: {', '.join(os.path.basename(imagem) for imagem in amostra)}\n")
+		for nome in ('BINARIZACAO_BLUR', 'BINARIZACAO_BLOCKSIZE', 'BINARIZACAO_LIMIAR', 'NOISE_VERYSMALL', \
+				'NOISE_SMALL', 'NOISE_ISOLATION_MIN', 'CHAR_RADIUS_MIN'):
+			file.write(f'{nome} = {parametros[nome]!r}\n')
+	print(f'Parâmetros calibrados gravados em: {arquivo}')
+
+
+def gravar_relatorio(metricas_paginas, metricas_execucao, arquivo_json, arquivo_csv):
+	'''
+	Grava o relatório da execução: as métricas de cada página e o resumo de cada etapa
+	(total, média e percentis 50/90/99 do tempo, CPU total e pico de memória)
+
+	Args:
+		metricas_paginas: Dict {nome da página: métricas} (ver medir e contar)
+		metricas_execucao: Métricas das etapas que não são por página (ex: correção do texto completo)
+		arquivo_json: Caminho do relatório completo em JSON
+		arquivo_csv: Caminho da tabela com uma linha por página, para abrir em planilhas
+	'''
+	import csv
+
+	etapas = {}
+	for metricas in metricas_paginas.values():
+		for etapa, registro in metricas.get('etapas', {}).items():
+			etapas.setdefault(etapa, []).append(registro)
+
+	resumo = {}
+	for etapa, registros in sorted(etapas.items()):
+		tempos = np.array([registro['tempo'] for registro in registros])
+		p50, p90, p99 = np.percentile(tempos, [50, 90, 99]).tolist()
+		resumo[etapa] = {
+			'paginas': len(registros), 'tempo_total': float(tempos.sum()), 'tempo_medio': float(tempos.mean()),
+			'tempo_p50': p50, 'tempo_p90': p90, 'tempo_p99': p99, 'tempo_max': float(tempos.max()),
+			'cpu_total': sum(registro['cpu'] for registro in registros),
+			'memoria_mb_max': max(registro['memoria_mb'] for registro in registros),
+		}
+
+	contadores = {}
+	for metricas in metricas_paginas.values():
+		for nome, quantidade in metricas.get('contadores', {}).items():
+			contadores[nome] = contadores.get(nome, 0) + quantidade
+
+	with open(arquivo_json, 'w') as file:
+		json.dump({'execucao': metricas_execucao, 'resumo': resumo, 'contadores': contadores, \
+				'paginas': metricas_paginas}, file, indent=1, ensure_ascii=False)
+
+	# Uma coluna por etapa/medida e por contador, uma linha por página
+	colunas = [f'{etapa}.{medida}' for etapa in resumo for medida in ('tempo', 'cpu', 'memoria_mb')] + sorted(contadores)
+	with open(arquivo_csv, 'w', newline='') as file:
+		escritor = csv.writer(file)
+		escritor.writerow(['pagina'] + colunas)
+		for nome, metricas in metricas_paginas.items():
+			valores = {f'{etapa}.{medida}': round(valor, 4) for etapa, registro in metricas.get('etapas', {}).items() \
+					for medida, valor in registro.items()}
+			valores.update(metricas.get('contadores', {}))
+			escritor.writerow([nome] + [valores.get(coluna, '') for coluna in colunas])
+
+	print(f'Relatório da execução gravado em: {arquivo_json}')
+
+
+def hash_imagem(imagem):
+	'''
+	Calcula o hash do conteúdo de uma imagem, seja um arquivo (bytes do arquivo) ou uma NumPy Array
+
+	Args:
+		imagem: Caminho completo do arquivo ou NumPy Array
+
+	Returns:
+		String: Hash hexadecimal
+	'''
+	import hashlib
+
+	h = hashlib.blake2b(digest_size=20)
+	if isinstance(imagem, str):
+		with open(imagem, 'rb') as file:
+			for bloco in iter(lambda: file.read(1 << 20), b''):
+				h.update(bloco)
+	else:
+		h.update(repr((imagem.shape, imagem.dtype.str)).encode('utf-8'))
+		h.update(np.ascontiguousarray(imagem).data)
+	return h.hexdigest()
+
+
+def image_align(image, vertices, bordas=(0, 0, 0, 0), escala=1.0, interpolacao=cv.INTER_LINEAR):
+	'''
+	Extrai e alinha o quadrilátero contido na imagem
+	A remoção das bordas e a mudança de escala são incorporadas na própria matriz de perspectiva,
+	assim somente a região mantida é interpolada, já no tamanho final
+
+	Args:
+		image: Imagem contendo um quadrilatero
+		vertices: Array contendo as coordenadas dos 4 vértices do quadrilatero
+		bordas: Qtd de pixels removidos de cada lado [sup, dir, inf, esq], na escala do retângulo alinhado
+		escala: Fator aplicado às dimensões da imagem de saída. Ex: 0.5 produz metade da largura e da altura
+		interpolacao: Modo de interpolação do OpenCV. Ex: cv.INTER_LINEAR, cv.INTER_CUBIC
+
+	Returns:
+		NumPy Array: Imagem alinhada, sem as bordas
+	'''
+	# determina as coordenadas do retangulo que contem o quadrilatero
+	min_x = min(p[0] for p in vertices)
+	min_y = min(p[1] for p in vertices)
+	max_x = max(p[0] for p in vertices)
+	max_y = max(p[1] for p in vertices)
+	# Converte os vertices em uma array numpy
+	origem_np = np.array([[float(vertice[0]), float(vertice[1])] for vertice in vertices], dtype=np.float32)
+	# Define as dimensões do retangulo destino
+	largura, altura = max_x - min_x, max_y - min_y
+	print(f"image_align. Dimensões do retangulo que conterá o quadrilatero extraído da imagem original: {largura} x {altura}")
+	destino_np = np.array([[0, 0], [largura - 1, 0], [largura - 1, altura - 1], [0, altura - 1]], dtype=np.float32)
+	# Calcular a matriz de transformação de perspectiva
+	matrix = cv.getPerspectiveTransform(origem_np, destino_np)
+
+	# Desloca a origem para depois da borda superior/esquerda e aplica a escala,
+	# de modo que a saída contenha somente a região mantida
+	superior, direita, inferior, esquerda = (int(borda) for borda in bordas)
+	ajuste = np.array([[escala, 0, -esquerda * escala], [0, escala, -superior * escala], [0, 0, 1]], dtype=np.float64)
+	matrix = ajuste @ matrix
+	largura_saida = max(1, round((largura - esquerda - direita) * escala))
+	altura_saida = max(1, round((altura - superior - inferior) * escala))
+	if bordas != (0, 0, 0, 0) or escala != 1.0:
+		print(f"image_align. Dimensões após remoção das bordas e escala {escala:.3f}: {largura_saida} x {altura_saida}")
+
+	# Extrai e alinha o quadrilatero, aplicando uma transformação de perspectiva
+	image_aligned = cv.warpPerspective(image, matrix, (largura_saida, altura_saida), flags=interpolacao)
+	return image_aligned
+
+
+def imprimir_texto(image, texto, coordenadas, cor):
+	"""
+	Imprime um texto em uma imagem nas coordenadas especificadas.
+
+	Args:
+		image (numpy.ndarray): A imagem onde o texto será desenhado.
+		texto (str): O texto a ser impresso na imagem.
+		coordenadas (tuple): Um par de coordenadas (x, y) onde o texto será desenhado.
+	"""
+	fonte = cv.FONT_HERSHEY_SIMPLEX
+	tamanho_fonte = 0.5
+	espessura = 1
+
+	cv.putText(image, texto, coordenadas, fonte, tamanho_fonte, cor, espessura)
+
+
+def indexar_centros(contornos, char_radius_min, tamanho_celula):
+	'''
+	Monta um índice espacial (grade) com os centros dos contornos que podem ser caracteres
+	Cada célula da grade tem o tamanho da distância de isolamento, assim um ruído só precisa
+	ser comparado com os caracteres das 9 células em torno da sua.
+	O índice é formado por arrays ordenadas pela célula, para ser consultado em lote
+
+	Args:
+		contornos: Array estruturada gerada por extrair_contornos
+		char_radius_min: Raio minimo de um caractere. Contornos menores não são indexados
+		tamanho_celula: Lado de cada célula da grade em pixels (noise_dist_min)
+
+	Returns:
+		Dict: celula, origem e colunas da grade, chaves ordenadas e ids dos caracteres na mesma ordem
+	'''
+	celula = max(1, int(tamanho_celula))
+	col = contornos['cx'] // celula; lin = contornos['cy'] // celula
+
+	# Deixa uma célula de folga em cada lado para que as vizinhas nunca tenham chave negativa
+	origem = (int(col.min()) - 1, int(lin.min()) - 1) if len(contornos) else (-1, -1)
+	colunas = (int(col.max()) - origem[0] + 2) if len(contornos) else 3
+	chaves = (lin.astype(np.int64) - origem[1]) * colunas + (col - origem[0])
+
+	# Ordenação estável: dentro de cada célula os ids continuam em ordem crescente
+	ids = np.flatnonzero(contornos['raio'] >= char_radius_min)
+	ordem = np.argsort(chaves[ids], kind='stable')
+	return {'celula': celula, 'colunas': colunas, 'chaves': chaves, \
+			'chaves_ordenadas': chaves[ids][ordem], 'ids': ids[ordem]}
+
+
+def inicializar_processo(threads_opencv=1):
+	'''
+	Inicializa cada processo do modo paralelo
+
+	Args:
+		threads_opencv: Qtd de threads internas que o OpenCV pode usar neste processo
+	'''
+	cv.setNumThreads(threads_opencv)
+
+
+def inicializar_processo_calibracao(paginas, backend, tesseract_config, dicionario=''):
+	'''
+	Inicializa cada processo da calibração: abre as páginas alinhadas (sem copiá-las para a memória),
+	cria o motor de OCR e carrega o dicionário
+
+	Args:
+		paginas: Arquivos .npy das páginas alinhadas
+		backend: Backend de OCR (ver criar_ocr)
+		tesseract_config: Parâmetros no formato da linha de comando do tesseract
+		dicionario: Arquivo com uma palavra por linha, ou vazio
+	'''
+	from collections import OrderedDict
+
+	global CALIBRACAO_PROCESSO
+	cv.setNumThreads(1)
+	palavras = None
+	if dicionario:
+		with open(dicionario, encoding='utf-8') as file:
+			palavras = {linha.strip().lower() for linha in file if linha.strip()}
+	CALIBRACAO_PROCESSO = {
+		'paginas': [np.load(arquivo, mmap_mode='r') for arquivo in paginas],
+		'ocr': criar_ocr(backend, tesseract_config, confianca=True)[0],
+		'dicionario': palavras,
+		'suavizadas': {},
+		'limiarizadas': OrderedDict(),
+		'pontuacoes': {},
+	}
+
+
+def inicializar_processo_servico(threads_opencv, backend, tesseract_config, cache=None, regioes=1, duplicatas=None):
+	'''
+	Inicializa cada processo do modo serviço, que faz o tratamento e o OCR das fotos (ver executar_servico)
+
+	Args:
+		threads_opencv: Threads internas do OpenCV em cada processo
+		backend: Backend de OCR (ver criar_ocr)
+		tesseract_config: Parâmetros no formato da linha de comando do tesseract
+		cache: Dict {'pasta', 'tamanho_max'} do cache de resultados, ou None
+		regioes: Qtd máxima de regiões de cada página reconhecidas em paralelo (ver criar_ocr)
+		duplicatas: Dict {'arquivo', 'distancia'} do índice de duplicatas (ver criar_ocr), ou None
+	'''
+	# Um processo por núcleo: cada motor do Tesseract usa uma única thread OpenMP para não disputar os núcleos.
+	# Precisa ser definido antes do motor ser carregado
+	os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+	inicializar_processo_ocr(backend, tesseract_config, cache, regioes, duplicatas=duplicatas)
+	inicializar_processo(threads_opencv)
+
+
+def inicializar_processo_ocr(backend, tesseract_config, cache=None, regioes=1, palavras=False, duplicatas=None):
+	'''
+	Inicializa cada processo do pool de OCR, criando o motor que será reutilizado em todas as suas páginas
+
+	Args:
+		backend: Backend de OCR (ver criar_ocr)
+		tesseract_config: Parâmetros no formato da linha de comando do tesseract
+		cache: Dict {'pasta', 'tamanho_max'} do cache de resultados, ou None
+		regioes: Qtd máxima de regiões de cada página reconhecidas em paralelo (ver criar_ocr)
+		palavras: Retorna também as palavras de cada página (ver criar_ocr)
+		duplicatas: Dict {'arquivo', 'distancia'} do índice de duplicatas (ver criar_ocr), ou None
+	'''
+	global OCR_PROCESSO
+	OCR_PROCESSO, _ = criar_ocr(backend, tesseract_config, cache, regioes=regioes, palavras=palavras, duplicatas=duplicatas)
+	cv.setNumThreads(1)
+
+
+def interpretar_tesseract_config(tesseract_config):
+	'''
+	Converte os parâmetros de linha de comando do tesseract (TESSERACT_CONFIG) para as opções da API
+	Suporta: -l, --psm, --oem, --tessdata-dir, --dpi e -c variavel=valor
+
+	Args:
+		tesseract_config: String. Ex: '--psm 6 -l por -c preserve_interword_spaces=1'
+
+	Returns:
+		Dict: lang, psm, oem, tessdata e variaveis
+	'''
+	opcoes = {'lang': 'eng', 'psm': 3, 'oem': 3, 'tessdata': None, 'variaveis': {}}
+	tokens = tesseract_config.split()
+	for i, token in enumerate(tokens):
+		valor = tokens[i + 1] if i + 1 < len(tokens) else None
+		if token == '-l': opcoes['lang'] = valor
+		elif token == '--psm': opcoes['psm'] = int(valor)
+		elif token == '--oem': opcoes['oem'] = int(valor)
+		elif token == '--tessdata-dir': opcoes['tessdata'] = valor
+		elif token == '--dpi': opcoes['variaveis']['user_defined_dpi'] = valor
+		elif token == '-c' and valor and '=' in valor:
+			nome, valor = valor.split('=', 1)
+			opcoes['variaveis'][nome] = valor
+	return opcoes
+
+
+def interpretar_tsv(tsv):
+	'''
+	Extrai as palavras da saída TSV do Tesseract (mesmo formato do pytesseract.image_to_data)
+
+	Args:
+		tsv: Texto TSV, com ou sem a linha de cabeçalho
+
+	Returns:
+		List: [palavra, confiança (0 a 100), x, y, largura, altura] de cada palavra, na ordem de leitura
+	'''
+	palavras = []
+	for linha in tsv.splitlines():
+		colunas = linha.split('\t')
+		# Somente as linhas do nível 5 (palavra) com texto e confiança válida
+		if len(colunas) < 12 or colunas[0] != '5' or not colunas[11].strip() or float(colunas[10]) < 0:
+			continue
+		x, y, largura, altura = (int(valor) for valor in colunas[6:10])
+		palavras.append([colunas[11], float(colunas[10]), x, y, largura, altura])
+	return palavras
+
+
+def ler_cache(cache, chave):
+	'''
+	Lê um resultado do cache
+
+	Args:
+		cache: Dict {'pasta', 'tamanho_max'} ou None (cache desligado)
+		chave: Chave gerada por chave_cache
+
+	Returns:
+		Bytes: Conteúdo gravado, ou None quando não estiver no cache
+	'''
+	if not cache: return None
+	conexao = abrir_cache(cache)
+	if not conexao.execute('SELECT 1 FROM entradas WHERE chave = ?', (chave,)).fetchone():
+		return None
+	try:
+		with open(os.path.join(cache['pasta'], chave[:2], chave), 'rb') as file:
+			dados = file.read()
+	except FileNotFoundError:
+		conexao.execute('DELETE FROM entradas WHERE chave = ?', (chave,))
+		return None
+	conexao.execute('UPDATE entradas SET acesso = ? WHERE chave = ?', (time.time(), chave))
+	return dados
+
+
+def ler_pagina(conexao, nome):
+	'''
+	Lê uma única página do arquivo de páginas (ver abrir_paginas)
+
+	Args:
+		conexao: Conexão retornada por abrir_paginas
+		nome: Nome da página (caminho da imagem binarizada)
+
+	Returns:
+		Dict: Colunas da página, com as palavras e as métricas já convertidas, ou None quando não existir
+	'''
+	cursor = conexao.execute('SELECT * FROM paginas WHERE nome = ?', (nome,))
+	linha = cursor.fetchone()
+	if linha is None:
+		return None
+	pagina = dict(zip([coluna[0] for coluna in cursor.description], linha))
+	pagina['palavras'] = json.loads(pagina['palavras'])
+	pagina['metricas'] = json.loads(pagina['metricas']) if pagina['metricas'] else None
+	return pagina
+
+
+def list_files_from_folder(folder, regex):
+	"""
+	Retorna uma lista de todos as imagens de uma determinada pasta em ordem alfabetica.
+	Para pastas muito grandes, prefira listar_imagens, que entrega as fotos sob demanda
+
+	Args:
+		folder: String com o caminho da pasta
+		regex: Expressão regular contendo o que deve ser filtrado
+
+	Returns:
+		array: Lista dos caminhos completos dos arquivos
+	"""
+	regexp = re.compile(regex, re.IGNORECASE)
+	return [fullpath for fullpath in listar_imagens(folder, None) if regexp.search(fullpath)]
+
+
+def listar_imagens(pasta, extensoes=EXTENSOES_IMAGENS, recursivo=False, ordenar=True, manifesto=None, particao=(0, 1), \
+		ignorar=()):
+	'''
+	Lista as fotos de uma pasta sob demanda. O os.scandir traz o tipo de cada entrada junto com o nome, sem um os.stat
+	por arquivo, e o filtro compara somente a extensão do nome
+
+	Args:
+		pasta: Caminho da pasta
+		extensoes: Extensões aceitas, sem diferenciar maiúsculas de minúsculas. None aceita qualquer arquivo
+		recursivo: Percorre também as subpastas. Links simbólicos para pastas não são seguidos
+		ordenar: Entrega as fotos em ordem alfabética, o que exige ler a pasta inteira antes da primeira.
+			False entrega cada foto assim que é encontrada, na ordem do sistema de arquivos
+		manifesto: Arquivo com a lista ordenada das fotos, um caminho relativo por linha. Quando existe, é lido no lugar
+			da pasta. Quando não existe, é gravado na primeira listagem. None não usa manifesto
+		particao: (índice, total). Entrega somente as fotos cujo CRC32 do caminho relativo, dividido pelo total, deixa
+			resto igual ao índice. Várias máquinas dividem a mesma pasta sem combinar nada entre si
+		ignorar: Subpastas que não são percorridas (ex: a pasta de saída)
+
+	Yields:
+		String: Caminho completo de cada foto
+	'''
+	import zlib
+
+	extensoes = tuple(extensao.lower() for extensao in extensoes) if extensoes else None
+	ignorar = {os.path.normcase(os.path.abspath(caminho)) for caminho in ignorar}
+	indice, total = particao
+
+	def percorrer():
+		# Pilha explícita no lugar da recursão: a profundidade das pastas não tem limite
+		pendentes = [(pasta, '')]
+		while pendentes:
+			atual, relativo = pendentes.pop()
+			with os.scandir(atual) as entradas:
+				for entrada in entradas:
+					if entrada.is_dir(follow_symlinks=False):
+						if recursivo and os.path.normcase(os.path.abspath(entrada.path)) not in ignorar:
+							pendentes.append((entrada.path, os.path.join(relativo, entrada.name)))
+					elif entrada.is_file() and (extensoes is None or entrada.name.lower().endswith(extensoes)):
+						yield os.path.join(relativo, entrada.name)
+
+	if manifesto and os.path.exists(manifesto):
+		def ler_manifesto():
+			with open(manifesto, 'rb') as file:
+				for linha in file:
+					if linha.strip(): yield os.fsdecode(linha.rstrip(b'\r\n'))
+		relativos = ler_manifesto()
+	elif manifesto or ordenar:
+		relativos = sorted(percorrer())
+		if manifesto:
+			gravar_arquivo_atomico(manifesto, b''.join(os.fsencode(relativo) + b'\n' for relativo in relativos))
+	else:
+		relativos = percorrer()
+
+	for relativo in relativos:
+		# O hash usa '/' em qualquer sistema, para que todas as máquinas façam a mesma divisão
+		if total > 1 and zlib.crc32(relativo.replace(os.sep, '/').encode('utf-8', 'surrogateescape')) % total != indice:
+			continue
+		yield os.path.join(pasta, relativo)
+
+
+def mapear_em_ordem(pool, funcao, iteravel, pendentes):
+	'''
+	Equivalente ao pool.map, mas consome o iterável sob demanda e mantém no máximo "pendentes"
+	tarefas em andamento, para que uma etapa rápida não acumule todas as imagens na memória
+
+	Args:
+		pool: ThreadPoolExecutor ou ProcessPoolExecutor
+		funcao: Função executada para cada item
+		iteravel: Itens a serem processados
+		pendentes: Qtd máxima de tarefas em andamento
+
+	Yields:
+		O resultado de cada item, na mesma ordem da entrada
+	'''
+	from collections import deque
+
+	tarefas = deque()
+	for item in iteravel:
+		tarefas.append(pool.submit(funcao, item))
+		if len(tarefas) >= pendentes:
+			yield tarefas.popleft().result()
+	while tarefas:
+		yield tarefas.popleft().result()
+
+
+@contextlib.contextmanager
+def medir(metricas, etapa):
+	'''
+	Mede o tempo, o uso de CPU e o pico de memória de um trecho de código, acumulando em metricas['etapas'][etapa].
+	Não faz nada quando metricas for None. Uso: with medir(metricas, 'ocr'): ...
+
+	O CPU e a memória são do processo inteiro: com várias threads (OCR_PARALELISMO 'thread') incluem as demais páginas
+	em andamento. O CPU do binário do tesseract (backend pytesseract) roda em outro processo e não é contabilizado
+
+	Args:
+		metricas: Dict de métricas da página ou None
+		etapa: Nome da etapa. Etapas repetidas na mesma página são somadas
+	'''
+	if metricas is None:
+		yield
+		return
+
+	# O pico de memória é reiniciado a cada etapa. O pico até aqui é repassado às etapas que ainda estão abertas
+	pico = pico_memoria(reiniciar=True)
+	for registro_aberto in MEDICOES_ABERTAS:
+		registro_aberto['memoria_mb'] = max(registro_aberto['memoria_mb'], pico)
+	registro = metricas.setdefault('etapas', {}).setdefault(etapa, {'tempo': 0.0, 'cpu': 0.0, 'memoria_mb': 0.0})
+	MEDICOES_ABERTAS.append(registro)
+	inicio, inicio_cpu = time.perf_counter(), time.process_time()
+	try:
+		yield
+	finally:
+		registro['tempo'] += time.perf_counter() - inicio
+		registro['cpu'] += time.process_time() - inicio_cpu
+		registro['memoria_mb'] = max(registro['memoria_mb'], pico_memoria())
+		MEDICOES_ABERTAS.pop(next(i for i, aberto in enumerate(MEDICOES_ABERTAS) if aberto is registro))
+
+
+def mostrar_marcacoes(image, marcacoes):
+	'''
+	Apresenta as marcações da remoção de ruídos reduzidas ao tamanho da tela. Um clique abre, em outra janela,
+	o trecho em volta do ponto clicado na resolução original, desenhado somente naquele momento.
+	Qualquer tecla fecha as janelas e continua o processamento
+
+	Args:
+		image: Imagem usada como fundo (grayscale ou BGR), na resolução em que os contornos foram encontrados
+		marcacoes: Array estruturada (MARCACAO_DTYPE) retornada por convert_bw
+	'''
+	escala = escala_tela(image)
+	largura_tela, altura_tela = get_screen_resolution_linux()
+
+	def ampliar(evento, x, y, flags, parametro):
+		if evento != cv.EVENT_LBUTTONDOWN: return
+		# Ponto clicado na resolução original, no centro de uma janela do tamanho da tela
+		cx, cy = int(x / escala), int(y / escala)
+		janela = (cx - largura_tela // 2, cy - altura_tela // 2, cx + largura_tela // 2, cy + altura_tela // 2)
+		cv.imshow('Zoom', desenhar_marcacoes(image, marcacoes, 1.0, janela))
+
+	cv.namedWindow('Image')
+	cv.setMouseCallback('Image', ampliar)
+	update_image(desenhar_marcacoes(image, marcacoes, escala))
+	cv.destroyAllWindows()
+
+
+def nome_imagem(imagem):
+	'''
+	Nome usado nas mensagens para identificar uma foto, seja um arquivo ou uma imagem já em memória
+
+	Args:
+		imagem: Caminho completo do arquivo ou NumPy Array
+
+	Returns:
+		String: O próprio caminho, ou a descrição da imagem em memória
+	'''
+	if isinstance(imagem, np.ndarray):
+		return f'<imagem em memória {"x".join(str(tamanho) for tamanho in imagem.shape)}>'
+	return imagem
+
+
+def pico_memoria(reiniciar=False):
+	'''
+	Retorna o pico de memória residente (RSS) do processo em MB
+
+	Args:
+		reiniciar: Zera o pico após a leitura, para medir somente a próxima etapa (somente Linux)
+
+	Returns:
+		Float: Pico de memória em MB
+	'''
+	try:
+		with open('/proc/self/status') as file:
+			pico = next(int(linha.split()[1]) for linha in file if linha.startswith('VmHWM:')) / 1024
+	except (OSError, StopIteration):
+		import resource
+		return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+	if reiniciar:
+		try:
+			with open('/proc/self/clear_refs', 'w') as file:
+				file.write('5')
+		except OSError:
+			pass
+	return pico
+
+
+def pontuar_texto(texto, confiancas, dicionario=None):
+	'''
+	Pontua o texto extraído de uma página, para comparar parâmetros de binarização.
+	A pontuação cresce com a quantidade de texto bem reconhecido, e não somente com a proporção,
+	para que parâmetros que apagam parte do texto não sejam favorecidos
+
+	Args:
+		texto: Texto extraído
+		confiancas: Confiança (0 a 100) de cada palavra reconhecida
+		dicionario: Set de palavras em minúsculas. Quando informado, cada palavra do dicionário soma 1 e cada
+			palavra desconhecida subtrai 1. Sem dicionário, cada palavra soma de -1 (confiança 0) a 1 (confiança 100)
+
+	Returns:
+		Float: Pontuação da página
+	'''
+	if dicionario:
+		palavras = re.findall(r'[^\W\d_]+', texto.lower())
+		return float(sum(1 if palavra in dicionario else -1 for palavra in palavras))
+	return sum((confianca - 50) / 50 for confianca in confiancas)
+
+
+def processar_pagina_servico(argumentos):
+	'''
+	Trata a foto e extrai o texto dentro de um processo do modo serviço (ver inicializar_processo_servico)
+
+	Args:
+		argumentos: Tuple (imagem_full_path, imagem_saida_bw ou None, parametros, cache)
+
+	Returns:
+		String: Caminho da foto
+		String: Texto extraído, ou None em caso de falha
+		String: Mensagem de erro, ou None
+	'''
+	imagem_full_path, imagem_saida_bw, parametros, cache = argumentos
+	try:
+		image_bw = tratar_imagem(imagem_full_path, None, parametros, cache)
+		if imagem_saida_bw:
+			gravar_arquivo_atomico(imagem_saida_bw, codificar_imagem_bw(image_bw, imagem_saida_bw))
+		return imagem_full_path, OCR_PROCESSO(image_bw), None
+	except Exception as erro:
+		return imagem_full_path, None, f'{type(erro).__name__}: {erro}'
+
+
+def qualidade_vertices(pontos, indices, cantos, trecho=0.02):
+	'''
+	Estima a qualidade de cada vértice encontrado por calcular_vertices, a partir do ângulo
+	do contorno da folha naquele ponto. Um canto verdadeiro forma um ângulo próximo de 90 graus,
+	enquanto um ponto no meio de uma borda (canto cortado ou arredondado) fica próximo de 180
+
+	Args:
+		pontos: NumPy Array (N, 2) com os pontos do contorno da folha
+		indices: Indice, em pontos, de cada vértice encontrado
+		cantos: Canto da imagem (0 a 3, sentido horário) associado a cada vértice
+		trecho: Fração do perímetro percorrida para cada lado do vértice para medir o ângulo
+
+	Returns:
+		Array: 4 valores de 0 (ruim) a 1 (bom), um por canto. 0 para os cantos sem vértice
+	'''
+	qualidade = [0.0] * 4
+	if len(pontos) < 3 or not len(indices):
+		return qualidade
+
+	# Comprimento acumulado ao longo do contorno (fechado)
+	pontos = pontos.astype(np.float64)
+	segmentos = np.roll(pontos, -1, axis=0) - pontos
+	comprimentos = np.hypot(segmentos[:, 0], segmentos[:, 1])
+	acumulado = np.concatenate(([0.0], np.cumsum(comprimentos)))
+	perimetro = acumulado[-1]
+	if perimetro <= 0:
+		return qualidade
+
+	def ponto_no_perimetro(posicao):
+		# Interpola o ponto do contorno que está a "posicao" pixels do inicio, percorrendo o perimetro
+		posicao = np.mod(posicao, perimetro)
+		j = np.minimum(np.searchsorted(acumulado, posicao, 'right') - 1, len(pontos) - 1)
+		fracao = np.divide(posicao - acumulado[j], comprimentos[j], out=np.zeros_like(posicao), where=comprimentos[j] > 0)
+		return pontos[j] + fracao[:, None] * segmentos[j]
+
+	indices = np.asarray(indices)
+	inicio = acumulado[indices]
+	vertice = pontos[indices]
+	antes = ponto_no_perimetro(inicio - trecho * perimetro) - vertice
+	depois = ponto_no_perimetro(inicio + trecho * perimetro) - vertice
+	normas = np.hypot(antes[:, 0], antes[:, 1]) * np.hypot(depois[:, 0], depois[:, 1])
+	cosseno = np.divide((antes * depois).sum(axis=1), normas, out=np.ones(len(indices)), where=normas > 0)
+	angulo = np.degrees(np.arccos(np.clip(cosseno, -1.0, 1.0)))
+
+	# 90 graus ou menos: 1. 180 graus (borda reta): 0
+	for canto, valor in zip(cantos, np.clip((180.0 - angulo) / 90.0, 0.0, 1.0)):
+		qualidade[canto] = float(valor)
+	return qualidade
+
+
+def refinar_vertice(image_gs, vertice, canto, limiar, raio):
+	'''
+	Reposiciona um vértice encontrado na imagem reduzida usando a imagem original.
+	Dentro de uma janela em torno do vértice, seleciona o pixel claro (folha) mais próximo
+	do canto da imagem, o mesmo critério usado por calcular_vertices
+
+	Args:
+		image_gs: Imagem original em tons de cinza
+		vertice: Tuple (x, y) do vértice, já na escala da imagem original
+		canto: Tuple (x, y) do canto da imagem associado ao vértice
+		limiar: Limiar de binarização usado na detecção da folha
+		raio: Metade do lado da janela de busca em pixels
+
+	Returns:
+		Tuple: (x, y) do vértice refinado. Mantém o original caso não haja pixel claro na janela
+	'''
+	altura, largura = image_gs.shape[:2]
+	x0 = max(0, vertice[0] - raio); x1 = min(largura, vertice[0] + raio + 1)
+	y0 = max(0, vertice[1] - raio); y1 = min(altura, vertice[1] + raio + 1)
+
+	ys, xs = np.nonzero(image_gs[y0:y1, x0:x1] > limiar)
+	if not len(xs):
+		return vertice
+
+	xs = xs + x0; ys = ys + y0
+	i = int(np.argmin((xs - canto[0]) ** 2 + (ys - canto[1]) ** 2))
+	return int(xs[i]), int(ys[i])
+
+
+def registrar_duplicata(duplicatas, configuracao, assinatura, resultado):
+	'''
+	Grava no índice de duplicatas a assinatura e o resultado do OCR de uma página recém reconhecida
+
+	Args:
+		duplicatas: Dict {'arquivo', 'distancia'} (ver abrir_duplicatas)
+		configuracao: Chave da configuração do OCR (ver buscar_duplicata)
+		assinatura: Assinatura da página (ver assinatura_imagem)
+		resultado: String com o resultado do OCR, no mesmo formato gravado no cache
+	'''
+	abrir_duplicatas(duplicatas).execute('INSERT INTO assinaturas (configuracao, assinatura, resultado) VALUES (?, ?, ?)', \
+			(configuracao, assinatura, resultado))
+
+
+def resize_to_screen(image):
+	"""
+	Redimensiona uma imagem para que ele caiba na tela
+
+	Args:
+		image: Array NumPy contendo a imagem
+		escala: 1.0 pega a
+
+	Returns:
+		array: Lista dos caminhos completos dos arquivos
+	"""
+	proporcao = escala_tela(image)
+	if proporcao == 1.0:
+		return image
+
+	# Redimensiona a imagem, mantendo as proporções originais
+	altura_imagem, largura_imagem = image.shape[:2]
+	nova_largura = int(largura_imagem * proporcao)
+	nova_altura = int(altura_imagem * proporcao)
+	return cv.resize(image, (nova_largura, nova_altura))
+
+
+def segmentar_regioes(image_bw, regioes, espaco_coluna=0.02):
+	'''
+	Divide a página binarizada em regiões de linhas inteiras, para que sejam reconhecidas em paralelo.
+	Depois da remoção dos ruídos, sobram na imagem somente os caracteres, então as projeções dos pixels pretos
+	mostram onde estão as colunas (faixas verticais vazias em toda a altura) e os espaços entre as linhas
+
+	Cada coluna é dividida em faixas com quantidades semelhantes de texto, sempre cortadas no espaço entre duas linhas
+
+	Args:
+		image_bw: Imagem binarizada (texto preto sobre fundo branco)
+		regioes: Qtd desejada de regiões na página
+		espaco_coluna: Largura mínima do espaço entre colunas, em proporção da largura da página
+
+	Returns:
+		Array: Uma lista por coluna, da esquerda para a direita, com as regiões (x0, y0, x1, y1) de cima para baixo
+	'''
+	altura, largura = image_bw.shape[:2]
+	preto = image_bw < 128
+
+	def trechos_vazios(perfil):
+		# Inicio e fim de cada trecho sem pixels pretos que tem conteúdo dos dois lados
+		vazio = np.concatenate(([0], (perfil == 0).view(np.int8), [0]))
+		mudancas = np.diff(vazio)
+		inicios, fins = np.flatnonzero(mudancas == 1), np.flatnonzero(mudancas == -1)
+		internos = (inicios > 0) & (fins < len(perfil))
+		return inicios[internos], fins[internos]
+
+	inicios, fins = trechos_vazios(np.count_nonzero(preto, axis=0))
+	largos = (fins - inicios) >= espaco_coluna * largura
+	cortes_x = [0] + ((inicios[largos] + fins[largos]) // 2).tolist() + [largura]
+
+	faixas = max(1, -(-regioes // (len(cortes_x) - 1)))
+	colunas = []
+	for x0, x1 in zip(cortes_x[:-1], cortes_x[1:]):
+		perfil = np.count_nonzero(preto[:, x0:x1], axis=1)
+		inicios, fins = trechos_vazios(perfil)
+		espacos = (inicios + fins) // 2
+		cortes_y = [0]
+		if faixas > 1 and len(espacos):
+			# Escolhe, para cada divisão ideal da quantidade de pixels pretos, o espaço entre linhas mais próximo
+			acumulado = np.cumsum(perfil)
+			for alvo in np.searchsorted(acumulado, np.linspace(0, acumulado[-1], faixas + 1)[1:-1]):
+				corte = int(espacos[np.abs(espacos - alvo).argmin()])
+				if corte > cortes_y[-1]: cortes_y.append(corte)
+		cortes_y.append(altura)
+		colunas.append([(x0, y0, x1, y1) for y0, y1 in zip(cortes_y[:-1], cortes_y[1:])])
+	return colunas
+
+
+def seguir_borda(image_bw, x, y, buraco):
+	'''
+	Segue uma borda pixel a pixel direto na imagem, com o mesmo algoritmo do cv.findContours (Suzuki85), sem a
+	cópia da imagem inteira. Usada para os contornos que cruzam as divisões entre faixas (ver contornos_faixas)
+
+	Args:
+		image_bw: Imagem binária
+		x, y: Ponto inicial. Borda externa: primeiro pixel do componente branco. Buraco: pixel branco à esquerda do
+			primeiro pixel do componente preto
+		buraco: True para a borda de um buraco
+
+	Returns:
+		NumPy Array: Pontos do contorno, os mesmos de cv.findContours(..., cv.CHAIN_APPROX_SIMPLE)
+	'''
+	altura, largura = image_bw.shape[:2]
+	pixel = image_bw.item
+	dx = [direcao[0] for direcao in DIRECOES_BORDA] * 2
+	dy = [direcao[1] for direcao in DIRECOES_BORDA] * 2
+
+	# Primeiro vizinho branco no sentido horário, a partir do leste (buraco) ou do oeste (borda externa)
+	s = fim = 0 if buraco else 4
+	while True:
+		s = (s - 1) & 7
+		px, py = x + dx[s], y + dy[s]
+		if s == fim or (0 <= px < largura and 0 <= py < altura and pixel(py, px)):
+			break
+	if s == fim:
+		# Pixel isolado
+		return np.array([[[x, y]]], np.int32)
+
+	x1, y1 = x + dx[s], y + dy[s]
+	x3, y3 = x, y
+	anterior, pontos = s ^ 4, []
+	while True:
+		# Próximo vizinho branco no sentido anti-horário. Guarda somente os pontos onde a direção muda
+		for s in range(s + 1, s + 9):
+			x4, y4 = x3 + dx[s], y3 + dy[s]
+			if 0 <= x4 < largura and 0 <= y4 < altura and pixel(y4, x4): break
+		s &= 7
+		if s != anterior:
+			pontos.append((x3, y3)); anterior = s
+		if x4 == x and y4 == y and x3 == x1 and y3 == y1:
+			break
+		x3, y3 = x4, y4
+		s = (s + 4) & 7
+	return np.array(pontos, np.int32).reshape(-1, 1, 2)
+
+
+def show_image(image):
+	"""
+	Abre uma janela com a imagem e aguarda qualquer tecla para fecha-la
+
+	Args:
+		image: Array NumPy contendo a imagem
+		escala: 1.0 pega a
+
+	Returns:
+		array: Lista dos caminhos completos dos arquivos
+	"""
+	update_image(image)
+	cv.destroyAllWindows()
+	return None
+
+
+def tratar_imagem(imagem_full_path, imagem_saida_bw, parametros, cache=None, metricas=None, log_level=0):
+	'''
+	Executa o tratamento completo de uma imagem: detecção dos vértices, alinhamento,
+	remoção das bordas, binarização e gravação da imagem binarizada
+
+	Args:
+		imagem_full_path: Caminho completo da foto original, ou a foto já decodificada (NumPy Array)
+		imagem_saida_bw: Caminho completo da imagem binarizada a ser gravada. None para não gravar
+		parametros: Dict com os parâmetros de configuração do tratamento (mesmos nomes das configurações)
+		cache: Dict {'pasta', 'tamanho_max'}. Reaproveita os vértices e a imagem binarizada de execuções anteriores
+			com a mesma foto e os mesmos parâmetros. None desliga o cache
+		metricas: Dict onde são registrados tempo, CPU e memória de cada etapa (ver medir). None não registra
+		log_level: Com log_level > 0, mostra cada etapa em uma janela e grava as marcações dos ruídos (_DEBUG.png)
+			reduzidas ao tamanho da tela. Com log_level >= 2, o _DEBUG.png fica na resolução original
+
+	Returns:
+		NumPy Array: Imagem binarizada
+	'''
+	print(f"INICIO DO TRATAMENTO DA IMAGEM: {nome_imagem(imagem_full_path)}")
+
+	if cache:
+		# A chave combina o conteúdo da foto com os parâmetros que influenciam o resultado do tratamento
+		hash_original = hash_imagem(imagem_full_path)
+		chave_bw = chave_cache('bw', hash_original, sorted((nome, valor) for nome, valor in parametros.items() \
+				if nome not in ('VERTICES_QUALIDADE_MIN', 'BINARIZACAO_FAIXA')))
+
+		png = ler_cache(cache, chave_bw)
+		if png is not None:
+			print(f"Imagem binarizada encontrada no cache: {nome_imagem(imagem_full_path)}")
+			contar(metricas, 'cache_bw', 1)
+			image_bw = cv.imdecode(np.frombuffer(png, np.uint8), cv.IMREAD_GRAYSCALE)
+			if imagem_saida_bw:
+				with open(imagem_saida_bw, 'wb') as file:
+					file.write(png if imagem_saida_bw.endswith('.png') else codificar_imagem_bw(image_bw, imagem_saida_bw))
+			return image_bw
+
+	# Lê, encontra os vértices e alinha a folha, já sem as bordas
+	image_crop = alinhar_imagem(imagem_full_path, parametros, cache, metricas, hash_original if cache else None, log_level)
+
+	# Converte a imagem para binário
+	with medir(metricas, 'convert_bw'):
+		image_bw, marcacoes = convert_bw(image_crop, parametros['BINARIZACAO_BLUR'], parametros['BINARIZACAO_BLOCKSIZE'], \
+				parametros['BINARIZACAO_LIMIAR'], parametros['NOISE_VERYSMALL'], parametros['NOISE_SMALL'], \
+				parametros['NOISE_ISOLATION_MIN'], parametros['CHAR_RADIUS_MIN'], metricas, parametros['BINARIZACAO_FAIXA'])
+
+	if log_level > 0:
+		# As marcações são desenhadas sobre a foto alinhada, onde os ruídos removidos continuam visíveis
+		update_image(resize_to_screen(image_bw))
+		mostrar_marcacoes(image_crop, marcacoes)
+		if imagem_saida_bw:
+			# Gravada no tamanho da janela. Na resolução original (dezenas de MB em 48MP) somente com log_level >= 2
+			escala = 1.0 if log_level >= 2 else escala_tela(image_crop)
+			cv.imwrite(os.path.splitext(imagem_saida_bw)[0] + '_DEBUG.png', desenhar_marcacoes(image_crop, marcacoes, escala))
+
+	if cache or imagem_saida_bw:
+		with medir(metricas, 'gravacao'):
+			# O cache guarda sempre o PNG. O arquivo de saída segue o formato da sua extensão
+			png = cv.imencode('.png', image_bw, OPCOES_PNG_BW)[1].tobytes() if cache else None
+			if cache: gravar_cache(cache, chave_bw, 'bw', png)
+			if imagem_saida_bw:
+				with open(imagem_saida_bw, 'wb') as file:
+					file.write(png if png and imagem_saida_bw.endswith('.png') else codificar_imagem_bw(image_bw, imagem_saida_bw))
+	return image_bw
+
+
+def tratar_imagem_processo(argumentos):
+	'''
+	Executa tratar_imagem capturando os erros, para que uma imagem com problema não interrompa as demais
+
+	Args:
+		argumentos: Tuple (imagem_full_path, imagem_saida_bw, parametros, devolver_imagem, cache, medir_etapas, log_level)
+
+	Returns:
+		String: Caminho da imagem original
+		NumPy Array: Imagem binarizada, somente quando devolver_imagem for verdadeiro
+		String: Mensagem de erro, ou None caso o tratamento tenha sido concluído
+		Dict: Métricas da imagem (ver medir), ou None quando medir_etapas for falso
+	'''
+	imagem_full_path, imagem_saida_bw, parametros, devolver_imagem, cache, medir_etapas, log_level = argumentos
+	metricas = {} if medir_etapas else None
+	try:
+		with medir(metricas, 'tratamento'):
+			image_bw = tratar_imagem(imagem_full_path, imagem_saida_bw, parametros, cache, metricas, log_level)
+		return imagem_full_path, (image_bw if devolver_imagem else None), None, metricas
+	except Exception as erro:
+		return imagem_full_path, None, f'{type(erro).__name__}: {erro}', metricas
+
+
+def tratar_imagens(imagens_full_path, imagens_saida_bw, parametros, processos=1, threads_opencv=1, devolver_imagem=False, \
+		cache=None, medir_etapas=False, log_level=0):
+	'''
+	Trata uma sequência de imagens, opcionalmente distribuindo-as entre um pool de processos.
+	Os resultados saem na mesma ordem (alfabetica) da entrada, conforme cada imagem fica pronta
+
+	Args:
+		imagens_full_path: Sequência (lista ou gerador) com os caminhos das fotos originais
+		imagens_saida_bw: Sequência com os caminhos das imagens binarizadas, na mesma ordem (None para não gravar)
+		parametros: Dict com os parâmetros de configuração do tratamento
+		processos: Qtd de processos do pool. 1 trata as imagens no próprio processo
+		threads_opencv: Threads internas do OpenCV em cada processo. Evita que os processos disputem os núcleos
+		devolver_imagem: Retorna a imagem binarizada para a próxima etapa, sem precisar reler o arquivo
+		cache: Dict {'pasta', 'tamanho_max'} do cache de resultados, ou None
+		medir_etapas: Registra tempo, CPU e memória de cada etapa de cada imagem (ver medir)
+		log_level: Janelas de debug (ver tratar_imagem). Somente com processos = 1
+
+	Yields:
+		Tuple: (imagem_full_path, image_bw ou None, erro ou None, métricas ou None)
+	'''
+	argumentos = ((entrada, saida, parametros, devolver_imagem, cache, medir_etapas, log_level if processos <= 1 else 0) \
+			for entrada, saida in zip(imagens_full_path, imagens_saida_bw))
+	if processos <= 1:
+		yield from map(tratar_imagem_processo, argumentos)
+		return
+
+	from concurrent.futures import ProcessPoolExecutor
+
+	print(f'Tratando imagens em {processos} processos')
+	with ProcessPoolExecutor(max_workers=processos, initializer=inicializar_processo, initargs=(threads_opencv,)) as pool:
+		yield from mapear_em_ordem(pool, tratar_imagem_processo, argumentos, 2 * processos)
+
+
+def ultima_execucao(conexao):
+	'''
+	Execução que gravou a página mais recente do arquivo de páginas (ver abrir_paginas)
+
+	Args:
+		conexao: Conexão retornada por abrir_paginas
+
+	Returns:
+		str: Identificador da execução, ou None se o arquivo estiver vazio ou vier de uma versão sem execução
+	'''
+	linha = conexao.execute('SELECT execucao FROM paginas ORDER BY rowid DESC LIMIT 1').fetchone()
+	return linha[0] if linha else None
+
+
+def update_image(image):
+	'''
+	Abre uma janela para apresentar a imagem, mas nao a destroy depois de tecla pressionada
+	Caso a janela já esteja aberta, atualiza seu conteudo
+	'''
+	cv.imshow('Image', image)
+	cv.waitKey(0)
+	return None